@@ -0,0 +1,160 @@
+"""Метрики запросов: SQL, шаблоны, кеш и время ответа.
+
+Счётчики текущего запроса лежат в contextvar, их наполняют обёртки
+над курсором базы, рендерингом шаблонов и чтением кеша. Итоги по
+каждому имени URL хранятся в скользящем окне последних запросов.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# Границы корзин гистограммы, мс.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+current = ContextVar('request_metrics', default=None)
+
+_windows = defaultdict(lambda: deque(maxlen=settings.METRICS_WINDOW))
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    __slots__ = (
+        'started', 'queries', 'sql_time', 'template_time',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper."""
+    metrics = current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_time += time.perf_counter() - started
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(*args, **kwargs):
+        metrics = current.get()
+        if metrics is None:
+            return render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(*args, **kwargs)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get(get):
+    missing = object()
+
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, missing, version)
+        metrics = current.get()
+        if metrics is not None:
+            if value is missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is missing else value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        metrics = current.get()
+        # Базовый get_many читает ключи через get: не считать их дважды.
+        token = current.set(None)
+        try:
+            values = get_many(self, keys, version=version)
+        finally:
+            current.reset(token)
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument():
+    """Оборачивает рендеринг шаблонов Django и чтение всех кешей."""
+    from django.core.cache import caches
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _timed_render(Template.render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _counted_get(backend.get)
+        if not getattr(backend.get_many, 'instrumented', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+def record(name, metrics, duration):
+    with _lock:
+        _windows[name].append(
+            (duration, metrics.queries, metrics.sql_time)
+        )
+
+
+def _percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def snapshot():
+    """Сводка по окну последних запросов каждого имени URL.
+
+    Время в миллисекундах; buckets — накопительные счётчики
+    по границам BUCKETS, как в гистограммах Prometheus.
+    """
+    with _lock:
+        windows = {name: list(window) for name, window in _windows.items()}
+    report = {}
+    for name, window in windows.items():
+        durations = sorted(duration * 1000 for duration, _, _ in window)
+        report[name] = {
+            'count': len(window),
+            'p50': _percentile(durations, 0.5),
+            'p95': _percentile(durations, 0.95),
+            'p99': _percentile(durations, 0.99),
+            'queries': sum(queries for _, queries, _ in window) / len(window),
+            'sql_ms': sum(sql for _, _, sql in window) * 1000 / len(window),
+            'buckets': [
+                (bound, bisect_right(durations, bound))
+                for bound in BUCKETS
+            ],
+        }
+    return report
+
+
+def reset():
+    with _lock:
+        _windows.clear()
@@ -0,0 +1,90 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, prometheus
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Считает SQL, шаблоны и кеш каждого запроса.
+
+    Итоги уходят в заголовок Server-Timing, в окно metrics по имени
+    URL и в счётчики prometheus для /metrics; запросы дольше
+    SLOW_REQUEST_MS пишутся в лог.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.instrument()
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.sql_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        duration = request_metrics.elapsed()
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+        metrics.record(name, request_metrics, duration)
+        self.export(request, response, name, request_metrics, duration)
+        response['Server-Timing'] = self.server_timing(
+            request_metrics, duration
+        )
+        slow = settings.SLOW_REQUEST_MS
+        if slow is not None and duration * 1000 >= slow:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс',
+                request.method, request.get_full_path(), name,
+                duration * 1000, request_metrics.queries,
+                request_metrics.sql_time * 1000
+            )
+        return response
+
+    @staticmethod
+    def export(request, response, name, request_metrics, duration):
+        prometheus.inc(
+            'yatube_http_requests_total',
+            view=name, method=request.method, status=response.status_code
+        )
+        prometheus.observe(
+            'yatube_http_request_duration_seconds', duration, view=name
+        )
+        prometheus.inc(
+            'yatube_db_queries_total', request_metrics.queries, view=name
+        )
+        prometheus.inc(
+            'yatube_db_query_seconds_total', request_metrics.sql_time,
+            view=name
+        )
+        prometheus.inc(
+            'yatube_cache_requests_total', request_metrics.cache_hits,
+            result='hit'
+        )
+        prometheus.inc(
+            'yatube_cache_requests_total', request_metrics.cache_misses,
+            result='miss'
+        )
+
+    @staticmethod
+    def server_timing(request_metrics, duration):
+        return ', '.join((
+            'db;dur={:.1f};desc="{} queries"'.format(
+                request_metrics.sql_time * 1000, request_metrics.queries
+            ),
+            'tpl;dur={:.1f}'.format(request_metrics.template_time * 1000),
+            'cache;desc="hits={} misses={}"'.format(
+                request_metrics.cache_hits, request_metrics.cache_misses
+            ),
+            'total;dur={:.1f}'.format(duration * 1000),
+        ))
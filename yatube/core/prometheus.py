@@ -0,0 +1,239 @@
+"""Счётчики и гистограммы в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти. Если задан METRICS_DIR, не
+чаще раза в METRICS_FLUSH_INTERVAL секунд они сбрасываются в файл
+процесса METRICS_DIR/<pid>.json, а collect() складывает файлы всех
+процессов: /metrics показывает сумму по воркерам, а не по тому,
+который ответил на запрос.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Границы корзин гистограмм, секунды.
+BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+HELP = {
+    'yatube_http_requests_total': 'Запросы по имени URL, методу и статусу',
+    'yatube_http_request_duration_seconds': 'Время ответа по имени URL',
+    'yatube_db_queries_total': 'SQL-запросы по имени URL',
+    'yatube_db_query_seconds_total': 'Время SQL-запросов по имени URL',
+    'yatube_cache_requests_total': 'Чтения кеша: попадания и промахи',
+    'yatube_index_cache_requests_total': 'Страницы главной из кеша и заново',
+    'yatube_thumbnail_render_seconds': 'Создание миниатюр одной картинки',
+    'yatube_follow_feed_seconds': 'Сборка страницы ленты подписок',
+}
+
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+_pid = None
+_flushed = 0.0
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def _key(name, labels):
+    return name, tuple(
+        sorted((key, str(value)) for key, value in labels.items())
+    )
+
+
+def _load(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}, {}
+    counters = {
+        (name, tuple(map(tuple, labels))): value
+        for name, labels, value in data['counters']
+    }
+    histograms = {
+        (name, tuple(map(tuple, labels))): [counts, total]
+        for name, labels, counts, total in data['histograms']
+        # После смены BUCKETS старые файлы не сложить с новыми.
+        if len(counts) == len(BUCKETS) + 1
+    }
+    return counters, histograms
+
+
+def _own():
+    """Приводит значения в памяти к текущему процессу.
+
+    После fork дочерний процесс не должен повторно отдавать значения
+    родителя; если файл с тем же pid остался от завершившегося
+    процесса, его значения продолжают копиться.
+    """
+    global _pid
+    pid = os.getpid()
+    if _pid == pid:
+        return
+    _counters.clear()
+    _histograms.clear()
+    if settings.METRICS_DIR:
+        counters, histograms = _load(_path(pid))
+        _counters.update(counters)
+        _histograms.update(histograms)
+    _pid = pid
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _own()
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    with _lock:
+        _own()
+        key = _key(name, labels)
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        entry[0][bisect_left(BUCKETS, value)] += 1
+        entry[1] += value
+    _maybe_flush()
+
+
+@contextmanager
+def timer(name, **labels):
+    """Записывает время выполнения блока в гистограмму name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def flush():
+    """Сбрасывает значения процесса в его файл в METRICS_DIR."""
+    global _flushed
+    if not settings.METRICS_DIR:
+        return
+    with _lock:
+        _own()
+        data = {
+            'counters': [
+                [name, labels, value]
+                for (name, labels), value in _counters.items()
+            ],
+            'histograms': [
+                [name, labels, counts, total]
+                for (name, labels), (counts, total) in _histograms.items()
+            ],
+        }
+        _flushed = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _path(os.getpid())
+    # Читатели видят либо старый, либо новый файл целиком.
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def _maybe_flush():
+    interval = settings.METRICS_FLUSH_INTERVAL
+    if settings.METRICS_DIR and time.monotonic() - _flushed >= interval:
+        flush()
+
+
+def collect():
+    """Значения всех процессов: (counters, histograms), сложенные по ключу."""
+    if not settings.METRICS_DIR:
+        with _lock:
+            _own()
+            return dict(_counters), {
+                key: [list(counts), total]
+                for key, (counts, total) in _histograms.items()
+            }
+    flush()
+    counters, histograms = {}, {}
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith('.json'):
+            continue
+        file_counters, file_histograms = _load(
+            os.path.join(settings.METRICS_DIR, filename)
+        )
+        for key, value in file_counters.items():
+            counters[key] = counters.get(key, 0) + value
+        for key, (counts, total) in file_histograms.items():
+            entry = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+    return counters, histograms
+
+
+def reset():
+    """Обнуляет значения процесса и удаляет его файл."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        if settings.METRICS_DIR:
+            try:
+                os.remove(_path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+
+def _escape(value):
+    return (
+        value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+    )
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{key}="{_escape(value)}"' for key, value in pairs
+    ) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(lines, name, kind):
+    if name in HELP:
+        lines.append(f'# HELP {name} {HELP[name]}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def exposition():
+    """Текст для /metrics в формате Prometheus 0.0.4."""
+    counters, histograms = collect()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        _header(lines, name, 'counter')
+        for (key_name, labels), value in sorted(counters.items()):
+            if key_name == name:
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    for name in sorted({name for name, _ in histograms}):
+        _header(lines, name, 'histogram')
+        for (key_name, labels), (counts, total) in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else repr(bound)
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(labels, [('le', le)]), cumulative
+                ))
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_server_timing_and_window(self):
+        """Ответ содержит Server-Timing, окно копит запросы по имени URL."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('cache;desc="hits=', timing)
+        self.client.get(reverse('posts:index'))
+        report = metrics.snapshot()['posts:index']
+        self.assertEqual(report['count'], 2)
+        self.assertEqual(report['buckets'][-1][1], 2)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('"0 queries"', response['Server-Timing'])
+        self.assertIn('misses=0', response['Server-Timing'])
+
+    @override_settings(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=())
+    def test_latency_report_guarded(self):
+        """Окно отдаётся только с токеном /metrics."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get(reverse('latency')).status_code, 403)
+        response = self.client.get(
+            reverse('latency'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        report = response.json()['posts:index']
+        self.assertEqual(report['count'], 1)
+        self.assertEqual(len(report['buckets']), len(metrics.BUCKETS))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        """Медленные запросы пишутся в лог."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('about:author'))
+        self.assertIn('about:author', logs.output[0])
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+from .. import prometheus
+
+METRICS_DIR = tempfile.mkdtemp()
+TOKEN = 'secret'
+
+
+@override_settings(
+    METRICS_DIR=METRICS_DIR, METRICS_TOKEN=TOKEN, METRICS_ALLOWED_IPS=()
+)
+class PrometheusTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        prometheus.reset()
+        for filename in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, filename))
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {TOKEN}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_and_index_cache(self):
+        """Запросы, SQL и кеш главной попадают в /metrics."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"} 2', text
+        )
+        self.assertIn(
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2', text
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+        self.assertIn(
+            'yatube_index_cache_requests_total{result="hit"} 1', text
+        )
+        self.assertIn(
+            'yatube_index_cache_requests_total{result="miss"} 1', text
+        )
+
+    def test_follow_feed_timed(self):
+        """Сборка ленты подписок попадает в гистограмму."""
+        user = User.objects.create_user(username='reader')
+        self.client.force_login(user)
+        self.client.get(reverse('posts:follow_index'))
+        self.assertIn('yatube_follow_feed_seconds_count 1', self.scrape())
+
+    def test_processes_summed(self):
+        """Значения из файлов всех процессов складываются."""
+        prometheus.inc('yatube_test_total', 2)
+        prometheus.observe('yatube_test_seconds', 0.2)
+        prometheus.flush()
+        shutil.copy(
+            os.path.join(METRICS_DIR, f'{os.getpid()}.json'),
+            os.path.join(METRICS_DIR, '1.json')
+        )
+        text = prometheus.exposition()
+        self.assertIn('yatube_test_total 4', text)
+        self.assertIn('yatube_test_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('yatube_test_seconds_bucket{le="0.25"} 2', text)
+        self.assertIn('yatube_test_seconds_count 2', text)
+
+    def test_closed_without_token(self):
+        """Без токена и разрешённого адреса /metrics недоступен."""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer None'
+            )
+            self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=('127.0.0.1',)):
+            self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as latency_window
+from . import prometheus
 
 
 def page_not_found(request, exception):
@@ -11,3 +17,36 @@ def permission_denied(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def _metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus.
+
+    Без METRICS_TOKEN или METRICS_ALLOWED_IPS закрыты для всех.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        prometheus.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def latency(request):
+    """Перцентили и гистограмма времени ответа по именам URL.
+
+    Окно последних запросов хранится в памяти процесса, поэтому отчёт
+    относится к процессу, который ответил. Доступ — как у /metrics.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return JsonResponse(latency_window.snapshot())
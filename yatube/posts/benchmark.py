@@ -0,0 +1,207 @@
+"""Замеры лент на больших данных (команда benchmark_feeds).
+
+Для каждой ленты берётся самый «тяжёлый» объект: самая большая
+группа, самый плодовитый автор, самый обсуждаемый пост, читатель
+с наибольшим числом подписок. Лента открывается на первой странице
+и на глубине DEPTH страниц: по номеру (?page=, OFFSET) и по курсору
+(?cursor=), как туда попадает читатель, листающий ленту.
+
+Время меряется отдельно от числа запросов и памяти: трассировка
+tracemalloc и запись SQL сами замедляют ответ.
+"""
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, Timeline, User
+from .util import LIMIT, encode_cursor
+
+DEPTH: int = 100
+REPEAT: int = 20
+
+
+class Case:
+    def __init__(self, name, url, depth, user=None):
+        self.name = name
+        self.url = url
+        self.depth = depth
+        self.user = user
+
+
+def _pages(name, url, feed, user=None, depth=DEPTH):
+    """Первая страница и глубокие страницы ленты feed."""
+    yield Case(name, url, 'shallow', user)
+    deep = feed[depth * LIMIT - 1:depth * LIMIT].first()
+    if deep is None:
+        return
+    yield Case(name, f'{url}?page={depth + 1}', 'deep_page', user)
+    yield Case(
+        name, f'{url}?cursor={encode_cursor(deep)}', 'deep_cursor', user
+    )
+
+
+def cases(depth=DEPTH):
+    posts = Post.objects.order_by('-pub_date', '-pk')
+    yield from _pages('index', reverse('posts:index'), posts, depth=depth)
+
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        yield from _pages(
+            'group_posts',
+            reverse('posts:group_list', args=(group.slug,)),
+            posts.filter(group=group),
+            depth=depth
+        )
+
+    author = User.objects.order_by('-profile__posts_count').first()
+    if author is not None:
+        yield from _pages(
+            'profile',
+            reverse('posts:profile', args=(author.username,)),
+            posts.filter(author=author),
+            depth=depth
+        )
+
+    post = posts.order_by('-comments_count').first()
+    if post is not None:
+        url = reverse('posts:post_detail', args=(post.pk,))
+        yield Case('post_detail', url, 'shallow')
+        comment = Comment.objects.filter(post=post).order_by(
+            'pub_date', 'pk'
+        )[depth * LIMIT - 1:depth * LIMIT].first()
+        if comment is not None:
+            yield Case(
+                'post_detail', f'{url}?cursor={encode_cursor(comment)}',
+                'deep_cursor'
+            )
+
+    reader = Follow.objects.values('user').annotate(
+        total=Count('pk')
+    ).order_by('-total').first()
+    if reader is not None:
+        reader = User.objects.get(pk=reader['user'])
+        entries = Timeline.objects.filter(user=reader).order_by(
+            '-pub_date', '-post_id'
+        )
+        deep = entries[depth * LIMIT - 1:depth * LIMIT].first()
+        url = reverse('posts:follow_index')
+        yield Case('follow_index', url, 'shallow', reader)
+        if deep is not None:
+            yield Case('follow_index', f'{url}?page={depth + 1}',
+                       'deep_page', reader)
+            yield Case(
+                'follow_index', f'{url}?cursor={encode_cursor(deep.post)}',
+                'deep_cursor', reader
+            )
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def measure(case, repeat=REPEAT, cold=False):
+    """Время, число запросов и пик памяти одного URL.
+
+    С cold=True кеш очищается перед каждым запросом.
+    """
+    client = Client()
+    if case.user is not None:
+        client.force_login(case.user)
+    response = client.get(case.url)
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        client.get(case.url)
+        timings.append((time.perf_counter() - started) * 1000)
+    if cold:
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(case.url)
+    # Следующий запрос очистит журнал SQL: считать нужно сейчас.
+    query_count = len(queries)
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(case.url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'view': case.name,
+        'depth': case.depth,
+        'url': case.url,
+        'status': response.status_code,
+        'queries': query_count,
+        'min_ms': round(min(timings), 2),
+        'p50_ms': round(_percentile(timings, 0.5), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def dataset():
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'groups': Group.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def run(repeat=REPEAT, depth=DEPTH, cold=False, progress=None):
+    """Отчёт для сравнения прогонов: окружение, данные и замеры."""
+    results = []
+    for case in cases(depth):
+        result = measure(case, repeat, cold)
+        results.append(result)
+        if progress:
+            progress(result)
+    return {
+        'created': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'options': {'repeat': repeat, 'depth': depth, 'cold': cold},
+        'dataset': dataset(),
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """Изменение p50 и числа запросов относительно baseline.
+
+    Возвращает [(view, depth, p50, p50 в baseline, queries,
+    queries в baseline)] для замеров, которые есть в обоих отчётах.
+    """
+    before = {
+        (result['view'], result['depth']): result
+        for result in baseline['results']
+    }
+    rows = []
+    for result in report['results']:
+        old = before.get((result['view'], result['depth']))
+        if old is not None:
+            rows.append((
+                result['view'], result['depth'],
+                result['p50_ms'], old['p50_ms'],
+                result['queries'], old['queries'],
+            ))
+    return rows
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import time
+from uuid import uuid4
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core import prometheus
+
+from .models import Post
+from .util import LIMIT, decode_cursor
+
+INDEX_GENERATION_KEY: str = 'posts:index:generation'
+INDEX_COUNT_KEY: str = 'posts:index:count:{}'
+INDEX_TIMEOUT: int = 600
+
+STALE_TIMEOUT: int = 300
+LOCK_TIMEOUT: int = 30
+WAIT_STEP: float = 0.05
+WAIT_STEPS: int = 40
+
+
+def index_generation():
+    return cache.get_or_set(INDEX_GENERATION_KEY, uuid4().hex, None)
+
+
+def bump_index():
+    """Новое поколение ключей главной: старые страницы устаревают."""
+    cache.set(INDEX_GENERATION_KEY, uuid4().hex, None)
+
+
+def invalidate_index():
+    # Повторная смена поколения после коммита отсекает страницы,
+    # собранные другими запросами до того, как изменение стало видно.
+    bump_index()
+    transaction.on_commit(bump_index)
+
+
+def _wait_for(key):
+    for _ in range(WAIT_STEPS):
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _lock_file(lock):
+    """Файл блокировки, если кеш файловый, иначе None.
+
+    FileBasedCache.add сначала проверяет ключ, потом пишет его, и два
+    процесса могут взять блокировку вместе. Файл, созданный с O_EXCL,
+    достаётся только одному.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, FileBasedCache):
+        return None
+    return backend._key_to_file(lock) + '.lock'
+
+
+def _acquire(lock, token):
+    path = _lock_file(lock)
+    if path is None:
+        return cache.add(lock, token, LOCK_TIMEOUT)
+    try:
+        expired = time.time() - os.path.getmtime(path) > LOCK_TIMEOUT
+    except FileNotFoundError:
+        expired = False
+    if expired:
+        # Блокировку упавшего процесса снимают по возрасту; в худшем
+        # случае значение пересчитают два процесса.
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as file:
+        file.write(token)
+    return True
+
+
+def _release(lock, token):
+    # Своя блокировка могла истечь и достаться другому, поэтому перед
+    # удалением сверяется токен.
+    path = _lock_file(lock)
+    if path is None:
+        if cache.get(lock) == token:
+            cache.delete(lock)
+        return
+    try:
+        with open(path) as file:
+            if file.read() != token:
+                return
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def single_flight(key, compute, timeout, version=None):
+    """Значение из кеша, которое пересчитывает только один процесс.
+
+    Значение считается свежим timeout секунд и пока совпадает version.
+    Устаревшее значение хранится ещё STALE_TIMEOUT секунд: пока его
+    пересчитывает процесс, взявший блокировку, остальные отдают
+    устаревшее. Если значения нет совсем, остальные ждут результата.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        entry_version, fresh_until, value = entry
+        if entry_version == version and fresh_until > time.time():
+            return value
+    lock = f'{key}:lock'
+    token = uuid4().hex
+    acquired = _acquire(lock, token)
+    if not acquired:
+        if entry is None:
+            entry = _wait_for(key)
+        if entry is not None:
+            return entry[2]
+    try:
+        value = compute()
+        cache.set(
+            key,
+            (version, time.time() + timeout, value),
+            timeout + STALE_TIMEOUT
+        )
+    finally:
+        # Не дождавшийся результата процесс считает без блокировки
+        # и не должен снимать чужую.
+        if acquired:
+            _release(lock, token)
+    return value
+
+
+def index_count(generation):
+    """Число постов главной; меняется только вместе с поколением ключей."""
+    return cache.get_or_set(
+        INDEX_COUNT_KEY.format(generation), Post.objects.count, INDEX_TIMEOUT
+    )
+
+
+def index_page_key(request, count):
+    """Ключ страницы главной по проверенным параметрам запроса.
+
+    Битый курсор и неверный номер страницы дают ключ той страницы,
+    которую на них отдаёт пагинатор, поэтому мусор в адресе не плодит
+    записей. Курсор хешируется: в ключе memcached нельзя пробелы и
+    больше 250 символов.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return 'posts:index:cursor'
+        direction, pub_date, pk = decoded
+        digest = hashlib.md5(
+            f'{direction}|{pub_date.isoformat()}|{pk}'.encode()
+        ).hexdigest()
+        return f'posts:index:cursor:{digest}'
+    page = Paginator(range(count), LIMIT).get_page(request.GET.get('page'))
+    return f'posts:index:page:{page.number}'
+
+
+def index_page(request, build):
+    """Страница главной из кеша, общая для всех пользователей.
+
+    Кешируется только список постов; шапка с данными пользователя
+    рендерится на каждый запрос. build получает число постов, чтобы
+    пагинатор не считал его заново.
+    """
+    generation = index_generation()
+    count = index_count(generation)
+    key = index_page_key(request, count)
+    built = []
+
+    def compute():
+        built.append(True)
+        return detach(build(count))
+
+    page_obj = single_flight(
+        key, compute, INDEX_TIMEOUT, version=generation
+    )
+    prometheus.inc(
+        'yatube_index_cache_requests_total',
+        result='miss' if built else 'hit'
+    )
+    return page_obj
+
+
+def detach(page_obj):
+    """Отвязывает страницу от запросов к базе, чтобы её можно было кешировать.
+
+    Посты страницы, число страниц и курсоры уже вычислены и сохраняются,
+    ленивые QuerySet пагинатора заменяются пустыми.
+    """
+    page_obj.object_list = list(page_obj.object_list)
+    page_obj.paginator.object_list = []
+    if hasattr(page_obj.paginator, 'streams'):
+        page_obj.paginator.streams = []
+    return page_obj
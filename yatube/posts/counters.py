@@ -0,0 +1,93 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, Profile, User
+
+BATCH_SIZE: int = 1000
+
+
+def change(queryset, field, delta):
+    # Счётчик мог разойтись вниз (bulk_create без сигналов): не даём ему
+    # уйти ниже нуля и нарушить CHECK, точное значение вернёт reconcile.
+    if delta:
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_profile(user_id, field, delta):
+    change(Profile.objects.filter(user_id=user_id), field, delta)
+
+
+def change_profiles(user_ids, field, delta):
+    change(Profile.objects.filter(user_id__in=user_ids), field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _actual(model, field, outer='pk'):
+    counts = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+COUNTERS = (
+    (Profile, 'posts_count', lambda: _actual(Post, 'author', 'user')),
+    (Profile, 'followers_count', lambda: _actual(Follow, 'author', 'user')),
+    (Profile, 'follows_count', lambda: _actual(Follow, 'user', 'user')),
+    (Group, 'posts_count', lambda: _actual(Post, 'group')),
+    (Post, 'comments_count', lambda: _actual(Comment, 'post')),
+)
+
+
+def profile(user):
+    """Профиль пользователя со счётчиками.
+
+    У пользователя, созданного в обход post_save (bulk_create, сырой
+    SQL), профиля нет: он создаётся здесь с посчитанными счётчиками.
+    """
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        pass
+    user.profile, _ = Profile.objects.get_or_create(user=user, defaults={
+        'posts_count': Post.objects.filter(author=user).count(),
+        'followers_count': Follow.objects.filter(author=user).count(),
+        'follows_count': Follow.objects.filter(user=user).count(),
+    })
+    return user.profile
+
+
+def create_missing_profiles():
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+    profiles = [Profile(user_id=user_id) for user_id in missing]
+    Profile.objects.bulk_create(profiles, ignore_conflicts=True)
+    return len(profiles)
+
+
+def reconcile():
+    """Пересчитывает разошедшиеся счётчики.
+
+    Возвращает список (модель, поле, число исправленных строк).
+    """
+    report = []
+    for model, field, actual in COUNTERS:
+        drifted = list(
+            model.objects.annotate(actual=actual()).exclude(
+                **{field: F('actual')}
+            ).values_list('pk', flat=True)
+        )
+        for start in range(0, len(drifted), BATCH_SIZE):
+            model.objects.filter(
+                pk__in=drifted[start:start + BATCH_SIZE]
+            ).update(**{field: actual()})
+        report.append((model, field, len(drifted)))
+    return report
@@ -0,0 +1,199 @@
+"""Синтетические данные для замеров лент (команда generate_dataset).
+
+Распределения скошены, как в живой соцсети: популярность авторов
+и активность пишущих подчиняются закону Ципфа, поэтому у немногих
+авторов — большая часть подписчиков и постов, а комментарии
+собираются на постах популярных авторов.
+
+Всё вставляется через bulk_create, сигналы при этом не срабатывают.
+Счётчики, ленты подписок и веса популярного пересчитываются в конце
+пакетно, тем же кодом, что чинит их в обычной работе.
+"""
+import random
+from array import array
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, timeline, trending
+from .cache import bump_index
+from .models import Comment, Follow, Group, Post, User
+from .util import preserved_dates
+
+BATCH_SIZE: int = 5000
+# Показатель степени в законе Ципфа: чем больше, тем сильнее перекос.
+SKEW: float = 1.1
+# Из скольких заготовленных фраз собираются тексты.
+PHRASES: int = 2000
+DAYS: int = 365
+
+
+def zipf_weights(count, skew=SKEW):
+    """Накопленные веса для random.choices: ранг k весит 1 / k^skew."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def _create(model, objects, batch_size, ignore_conflicts=False):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+            batch = []
+    model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+
+
+class Generator:
+    def __init__(self, prefix='bench', seed=0, batch_size=BATCH_SIZE,
+                 progress=None):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        faker = Faker('ru_RU')
+        faker.seed_instance(seed)
+        self.phrases = [faker.sentence(nb_words=8) for _ in range(PHRASES)]
+        self.now = timezone.now()
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.phrases, k=sentences))
+
+    def users(self, count):
+        # Хеш пароля дорогой: один на всех, войти под этими
+        # пользователями можно только через force_login.
+        password = make_password(None)
+        _create(User, (
+            User(username=f'{self.prefix}{number}', password=password)
+            for number in range(count)
+        ), self.batch_size)
+        counters.create_missing_profiles()
+        self.progress(f'Пользователей: {count}')
+        return array('q', User.objects.filter(
+            username__startswith=self.prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def groups(self, count):
+        _create(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{self.prefix}-{number}',
+                description=self.text(2)
+            )
+            for number in range(count)
+        ), self.batch_size)
+        self.progress(f'Групп: {count}')
+        return array('q', Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def follows(self, user_ids, average):
+        """Подписки: число на пользователя случайно, авторы по Ципфу."""
+        weights = zipf_weights(len(user_ids))
+        # Популярность не должна совпадать с порядком регистрации.
+        authors = list(user_ids)
+        self.random.shuffle(authors)
+
+        def edges():
+            for user_id in user_ids:
+                wanted = min(
+                    int(self.random.expovariate(1 / average)),
+                    len(authors) - 1
+                )
+                chosen = set(self.random.choices(
+                    authors, cum_weights=weights, k=wanted
+                ))
+                chosen.discard(user_id)
+                for author_id in chosen:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        _create(Follow, edges(), self.batch_size, ignore_conflicts=True)
+        self.progress(f'Подписок: {Follow.objects.count()}')
+        return authors, weights
+
+    def posts(self, count, authors, weights, group_ids):
+        """Посты популярных авторов чаще; половина без группы."""
+        seconds = DAYS * 24 * 3600
+
+        def rows():
+            for _ in range(count):
+                pub_date = self.now - timedelta(
+                    seconds=self.random.randrange(seconds)
+                )
+                yield Post(
+                    author_id=self.random.choices(
+                        authors, cum_weights=weights
+                    )[0],
+                    group_id=(
+                        self.random.choice(group_ids)
+                        if group_ids and self.random.random() < 0.5
+                        else None
+                    ),
+                    text=self.text(self.random.randint(1, 5)),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        with preserved_dates(Post, 'pub_date', 'updated'):
+            _create(Post, rows(), self.batch_size)
+        self.progress(f'Постов: {count}')
+
+    def comments(self, count, user_ids, authors, weights):
+        """Комментарии к постам авторов, выбранных по Ципфу."""
+        rank = {author_id: index for index, author_id in enumerate(authors)}
+        post_ids, post_ages, post_ranks = array('q'), array('d'), array('q')
+        for pk, author_id, pub_date in Post.objects.values_list(
+            'pk', 'author_id', 'pub_date'
+        ).order_by('pk').iterator():
+            post_ids.append(pk)
+            post_ages.append((self.now - pub_date).total_seconds())
+            post_ranks.append(rank.get(author_id, len(authors)))
+        if not post_ids:
+            return
+        post_weights = list(accumulate(
+            1 / (post_rank + 1) ** SKEW for post_rank in post_ranks
+        ))
+
+        def rows():
+            for _ in range(count):
+                index = self.random.choices(
+                    range(len(post_ids)), cum_weights=post_weights
+                )[0]
+                yield Comment(
+                    post_id=post_ids[index],
+                    author_id=self.random.choice(user_ids),
+                    text=self.text(1),
+                    pub_date=self.now - timedelta(
+                        seconds=self.random.uniform(0, post_ages[index])
+                    ),
+                )
+
+        with preserved_dates(Comment, 'pub_date'):
+            _create(Comment, rows(), self.batch_size)
+        self.progress(f'Комментариев: {count}')
+
+    def finish(self):
+        """Пересчитывает то, что в обычной работе делают сигналы."""
+        counters.reconcile()
+        timeline.sync_celebrities()
+        self.progress('Счётчики пересчитаны')
+        entries = timeline.rebuild(
+            User.objects.filter(username__startswith=self.prefix)
+        )
+        self.progress(f'Записей в лентах подписок: {entries}')
+        trending.refresh_all()
+        self.progress('Веса популярного пересчитаны')
+        bump_index()
+
+
+def generate(users, posts, groups, comments, follows, **options):
+    """Создаёт набор данных. follows — среднее число подписок."""
+    generator = Generator(**options)
+    user_ids = generator.users(users)
+    group_ids = generator.groups(groups)
+    authors, weights = generator.follows(user_ids, follows)
+    generator.posts(posts, authors, weights, group_ids)
+    generator.comments(comments, user_ids, authors, weights)
+    generator.finish()
@@ -0,0 +1,184 @@
+"""Граф подписок.
+
+Подписки пачкой: одна транзакция на любое число авторов. Строки
+пишутся сырым SQL без сигналов, поэтому счётчики и ленты обновляются
+здесь явно и тоже пачками, а не сигналами Follow.
+
+Авторы, на которых подписан пользователь, хранятся в кеше
+отсортированным массивом id: проверка подписки — бинарный поиск
+без запроса к базе.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from . import counters, timeline
+from .models import Follow, User
+
+FOLLOWEES_TIMEOUT: int = 3600
+# Авторов в одном INSERT/DELETE: держит число параметров в пределах SQLite.
+BATCH_SIZE: int = 400
+
+
+def _followees_key(user_id):
+    return f'posts:followees:{user_id}'
+
+
+def followees(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    key = _followees_key(user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = array('q', Follow.objects.filter(
+            user_id=user_id
+        ).order_by('author_id').values_list('author_id', flat=True))
+        cache.set(key, authors, FOLLOWEES_TIMEOUT)
+    return authors
+
+
+def _contains(authors, author_id):
+    index = bisect_left(authors, author_id)
+    return index < len(authors) and authors[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return _contains(followees(user_id), author_id)
+
+
+def following_many(user_id, author_ids):
+    """Те из author_ids, на которых подписан user_id: одно чтение кеша."""
+    authors = followees(user_id)
+    return {pk for pk in author_ids if _contains(authors, pk)}
+
+
+def invalidate(user_id):
+    # Повтор после коммита отсекает массив, который другой запрос
+    # успел собрать из ещё не изменённых данных.
+    key = _followees_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def resolve(usernames, user):
+    """id авторов по именам одним запросом, без самого пользователя."""
+    return dict(User.objects.filter(
+        username__in=set(usernames)
+    ).exclude(pk=user.pk).values_list('pk', 'username'))
+
+
+def _can_return():
+    """Поддерживает ли база RETURNING: PostgreSQL и SQLite с 3.35."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' RETURNING author_id', params)
+        return [author_id for author_id, in cursor.fetchall()]
+
+
+def _existing(user_id, author_ids):
+    """Уже существующие подписки из author_ids — для баз без RETURNING.
+
+    Блокировка строки пользователя не даёт параллельному запросу
+    изменить его подписки между чтением и записью.
+    """
+    list(User.objects.select_for_update().filter(pk=user_id).values('pk'))
+    return set(Follow.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def _insert(user_id, author_ids):
+    """Вставляет подписки; id авторов строк, вставленных этим запросом.
+
+    RETURNING при ON CONFLICT DO NOTHING (INSERT OR IGNORE в SQLite)
+    отдаёт только реально вставленные строки: подписку, которую
+    параллельно успел вставить другой запрос, в них не будет.
+    """
+    if not _can_return():
+        existing = _existing(user_id, author_ids)
+        new = [pk for pk in author_ids if pk not in existing]
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=pk) for pk in new],
+            ignore_conflicts=True
+        )
+        return new
+    operations = connection.ops
+    values = ', '.join(['(%s, %s)'] * len(author_ids))
+    return _returning(
+        f'{operations.insert_statement(ignore_conflicts=True)} '
+        f'{Follow._meta.db_table} (user_id, author_id) VALUES {values}'
+        + operations.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        [value for pk in author_ids for value in (user_id, pk)]
+    )
+
+
+def _delete(user_id, author_ids):
+    """Удаляет подписки одним DELETE; id авторов удалённых строк."""
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    sql = (
+        f'DELETE FROM {Follow._meta.db_table} '
+        f'WHERE user_id = %s AND author_id IN ({placeholders})'
+    )
+    params = [user_id, *author_ids]
+    if _can_return():
+        return _returning(sql, params)
+    deleted = sorted(_existing(user_id, author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    return deleted
+
+
+def _batches(author_ids):
+    author_ids = sorted(set(author_ids))
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        yield author_ids[start:start + BATCH_SIZE]
+
+
+@transaction.atomic
+def follow_many(user, author_ids):
+    """Подписывает user на авторов; возвращает id новых подписок.
+
+    Счётчики, ленту и кеш меняют только строки, которые вставил именно
+    этот вызов: повторную или параллельную подписку гасит uniq_follower.
+    """
+    new = []
+    for batch in _batches(author_ids):
+        new.extend(_insert(user.pk, batch))
+    if not new:
+        return []
+    invalidate(user.pk)
+    counters.change_profile(user.pk, 'follows_count', len(new))
+    for batch in _batches(new):
+        counters.change_profiles(batch, 'followers_count', 1)
+        timeline.sync_celebrities(batch)
+        timeline.backfill_many(user.pk, batch)
+    return new
+
+
+@transaction.atomic
+def unfollow_many(user, author_ids):
+    """Отписывает user от авторов; возвращает число удалённых подписок.
+
+    Подписки удаляются сырым DELETE, без сборщика удаления и сигналов
+    post_delete на каждую строку; их работу делают пачки ниже.
+    """
+    deleted = []
+    for batch in _batches(author_ids):
+        deleted.extend(_delete(user.pk, batch))
+    if not deleted:
+        return 0
+    invalidate(user.pk)
+    counters.change_profile(user.pk, 'follows_count', -len(deleted))
+    for batch in _batches(deleted):
+        counters.change_profiles(batch, 'followers_count', -1)
+        timeline.drop_many(user.pk, batch)
+        timeline.sync_celebrities(batch)
+    return len(deleted)
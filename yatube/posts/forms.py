@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -22,6 +24,12 @@ class PostForm(forms.ModelForm):
                 raise forms.ValidationError("Поле не заполнено!")
             return data
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.prepare(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,76 @@
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Принимаемые форматы; все они пересохраняются без метаданных
+# и уменьшаются, кроме анимированного GIF.
+FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+# Форматы, которые декодер умеет сразу уменьшать (Image.draft).
+DRAFTED = ('JPEG',)
+
+
+def max_pixels(format):
+    """Предел пикселей: без draft картинка декодируется целиком."""
+    if format in DRAFTED:
+        return settings.POST_IMAGE_MAX_PIXELS
+    return settings.POST_IMAGE_MAX_DECODED_PIXELS
+
+
+def check(upload):
+    """Отклоняет картинку по размеру файла и размерам из заголовка.
+
+    ImageField уже прочитал заголовок (upload.image), пиксели при этом
+    не декодируются.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise forms.ValidationError(
+            'Файл больше %s.' % filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+        )
+    format = upload.image.format
+    if format not in FORMATS:
+        raise forms.ValidationError(f'Формат {format} не поддерживается.')
+    width, height = upload.image.size
+    if width * height > max_pixels(format):
+        raise forms.ValidationError(
+            f'Картинка {width}x{height} слишком большая.'
+        )
+
+
+def prepare(upload):
+    """Уменьшает картинку до POST_IMAGE_MAX_SIZE и убирает метаданные.
+
+    Сам файл загрузки крупнее FILE_UPLOAD_MAX_MEMORY_SIZE лежит на диске;
+    в памяти остаётся только уменьшенная копия.
+    """
+    check(upload)
+    format = upload.image.format
+    upload.seek(0)
+    with Image.open(upload) as image:
+        animated = format == 'GIF' and getattr(image, 'is_animated', False)
+        if animated:
+            # Анимацию GIF не пересохранить кадром, файл остаётся как есть.
+            upload.seek(0)
+            return upload
+        # Для JPEG декодер сразу уменьшает картинку в 2-8 раз.
+        image.draft(image.mode, settings.POST_IMAGE_MAX_SIZE)
+        icc_profile = image.info.get('icc_profile')
+        transparency = image.info.get('transparency')
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail(settings.POST_IMAGE_MAX_SIZE)
+    options = {'optimize': True}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if format == 'GIF' and transparency is not None:
+        options['transparency'] = transparency
+    if format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.POST_IMAGE_QUALITY
+    content = BytesIO()
+    image.save(content, format, **options)
+    return InMemoryUploadedFile(
+        content, upload.field_name, upload.name, upload.content_type,
+        content.tell(), upload.charset
+    )
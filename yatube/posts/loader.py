@@ -0,0 +1,185 @@
+"""Массовая загрузка постов из JSONL или CSV (команда load_posts).
+
+Записи — объекты с полями text, author (username), group (slug,
+необязательно), pub_date (ISO 8601, необязательно) и image (имя файла
+в хранилище, необязательно). Файл читается потоком, посты пишутся
+пачками через bulk_create, каждая пачка — в своей транзакции.
+
+bulk_create не отправляет post_save, поэтому то, что делают сигналы
+поста, выполняется здесь пачками: счётчики и вес популярного — вместе
+с пачкой, ленты подписок, очередь поиска и миниатюры картинок — одним
+проходом в конце.
+"""
+import csv
+import gzip
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, thumbnails, timeline, trending
+from .cache import invalidate_index
+from .models import Group, IndexTask, Post, Profile, User
+from .util import preserved_dates
+
+BATCH_SIZE: int = 1000
+
+FORMATS = ('jsonl', 'csv')
+
+
+class LoadError(ValueError):
+    pass
+
+
+def open_input(path):
+    """Текстовый поток файла; .gz распаковывается на лету."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = name.rsplit('.', 1)[-1].lower()
+    return extension if extension in FORMATS else None
+
+
+def read_records(stream, format):
+    """Записи потока по одной: (номер строки, dict)."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield number, LoadError(f'некорректный JSON: {error}')
+            continue
+        if not isinstance(record, dict):
+            yield number, LoadError('ожидался объект JSON')
+            continue
+        yield number, record
+
+
+class Loader:
+    """Превращает записи в посты, держа справочники в памяти.
+
+    Пользователи и группы читаются из базы один раз целиком:
+    username -> id и slug -> id, а также число подписчиков автора
+    для веса популярного.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.followers = dict(
+            Profile.objects.values_list('user_id', 'followers_count')
+        )
+        self.now = timezone.now()
+        self.loaded = 0
+        self.errors = []
+
+    def build(self, record):
+        text = (record.get('text') or '').strip()
+        if not text:
+            raise LoadError('пустой text')
+        username = record.get('author') or ''
+        author_id = self.authors.get(username)
+        if author_id is None:
+            raise LoadError(f'нет пользователя {username!r}')
+        slug = record.get('group') or ''
+        group_id = None
+        if slug:
+            group_id = self.groups.get(slug)
+            if group_id is None:
+                raise LoadError(f'нет группы {slug!r}')
+        pub_date = self.now
+        if record.get('pub_date'):
+            pub_date = parse_datetime(record['pub_date'])
+            if pub_date is None:
+                raise LoadError(f'некорректная дата {record["pub_date"]!r}')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        return Post(
+            text=text,
+            author_id=author_id,
+            group_id=group_id,
+            image=record.get('image') or '',
+            pub_date=pub_date,
+            updated=pub_date,
+            score=trending.score(
+                pub_date, 0, self.followers.get(author_id, 0)
+            ),
+        )
+
+    @transaction.atomic
+    def save(self, posts):
+        with preserved_dates(Post, 'pub_date', 'updated'):
+            Post.objects.bulk_create(posts)
+        by_author = Counter(post.author_id for post in posts)
+        for author_id, count in by_author.items():
+            counters.change_profile(author_id, 'posts_count', count)
+        by_group = Counter(post.group_id for post in posts)
+        for group_id, count in by_group.items():
+            counters.change_group(group_id, count)
+        self.loaded += len(posts)
+
+    def load(self, records, progress=None):
+        """Загружает записи. Ошибочные пропускаются и копятся в errors."""
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        batch = []
+        for number, record in records:
+            try:
+                if isinstance(record, LoadError):
+                    raise record
+                batch.append(self.build(record))
+            except LoadError as error:
+                self.errors.append((number, str(error)))
+                continue
+            if len(batch) == self.batch_size:
+                self.save(batch)
+                batch = []
+                if progress:
+                    progress(self.loaded)
+        if batch:
+            self.save(batch)
+        if self.loaded:
+            self.finish(last_pk)
+        return self.loaded
+
+    def finish(self, last_pk):
+        """Ленты подписок, очередь поиска и миниатюры загруженных постов.
+
+        Новыми считаются посты с pk больше last_pk: загрузка
+        рассчитана на базу без параллельной записи постов.
+        """
+        with transaction.atomic():
+            timeline.fan_out_since(last_pk)
+            pks = Post.objects.filter(pk__gt=last_pk).values_list(
+                'pk', flat=True
+            )
+            tasks = (
+                IndexTask(kind=IndexTask.POST, object_id=pk)
+                for pk in pks.iterator()
+            )
+            while True:
+                batch = list(islice(tasks, self.batch_size))
+                if not batch:
+                    break
+                IndexTask.objects.bulk_create(batch)
+            # Миниатюры создаются после коммита, как при сохранении поста.
+            with_images = Post.objects.filter(pk__gt=last_pk).exclude(
+                image=''
+            ).only('pk', 'image')
+            for post in with_images.iterator():
+                thumbnails.schedule(post)
+            invalidate_index()
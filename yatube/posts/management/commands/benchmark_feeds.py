@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import DEPTH, REPEAT, compare, run
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время, запросы и память лент, пишет отчёт в JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл отчёта JSON.')
+        parser.add_argument(
+            '--baseline', help='Отчёт прошлого прогона для сравнения.'
+        )
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+        parser.add_argument(
+            '--depth', type=int, default=DEPTH,
+            help='Номер глубокой страницы, считая от первой.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+
+    def handle(self, *args, **options):
+        report = run(
+            options['repeat'], options['depth'], options['cold'],
+            progress=lambda result: self.stdout.write(
+                '{view} {depth}: p50 {p50_ms} мс, p95 {p95_ms} мс, '
+                'запросов {queries}, память {peak_kb} КБ'.format(**result)
+            )
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            for view, depth, p50, old_p50, queries, old_queries in compare(
+                report, baseline
+            ):
+                self.stdout.write(
+                    f'{view} {depth}: p50 {old_p50} -> {p50} мс '
+                    f'({(p50 - old_p50) / max(old_p50, 0.01) * 100:+.0f}%), '
+                    f'запросов {old_queries} -> {queries}'
+                )
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, TABLES, export, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в JSONL или CSV с gzip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(TABLES))
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--output',
+            help='Файл выгрузки; по умолчанию <table>.<format>.gz, '
+                 '- для stdout.'
+        )
+        parser.add_argument(
+            '--since',
+            help='Только записи с pub_date не раньше этой даты (ISO 8601).'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_since(options['since'])
+            if since is None:
+                raise CommandError(f'Некорректная дата: {options["since"]}')
+        table, format = options['table'], options['format']
+        path = options['output'] or f'{table}.{format}.gz'
+        if path == '-':
+            output = sys.stdout.buffer
+        else:
+            output = open(path, 'wb')
+        try:
+            for chunk in export(table, format, since):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
@@ -0,0 +1,37 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.dataset import BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетический набор данных для замеров лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--search', action='store_true',
+            help='Построить поисковый индекс по созданным данным.'
+        )
+
+    def handle(self, *args, **options):
+        generate(
+            options['users'], options['posts'], options['groups'],
+            options['comments'], options['follows'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=self.stdout.write
+        )
+        if options['search']:
+            call_command('reindex_posts', clear=True, stdout=self.stdout)
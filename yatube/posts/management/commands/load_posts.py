@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loader import (
+    BATCH_SIZE, FORMATS, Loader, guess_format, open_input, read_records
+)
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты из JSONL или CSV пачками через bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл .jsonl или .csv, можно .gz; - для stdin.'
+        )
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or guess_format(path)
+        if format is None:
+            raise CommandError('Укажите --format: jsonl или csv.')
+        loader = Loader(options['batch_size'])
+        stream = sys.stdin if path == '-' else open_input(path)
+        try:
+            loader.load(
+                read_records(stream, format),
+                progress=lambda done: self.stdout.write(f'Постов: {done}')
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        for number, error in loader.errors:
+            self.stderr.write(f'Строка {number}: {error}')
+        self.stdout.write(
+            f'Загружено постов: {loader.loaded}, '
+            f'пропущено: {len(loader.errors)}'
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «Кого почитать» по графу подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        found = rebuild(
+            options['batch_size'],
+            progress=lambda done, total: self.stdout.write(
+                f'Пользователей: {done}/{total}'
+            )
+        )
+        self.stdout.write(f'Рекомендации есть у {found} пользователей')
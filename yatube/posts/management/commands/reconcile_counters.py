@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import create_missing_profiles, reconcile
+from posts.timeline import sync_celebrities
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = create_missing_profiles()
+            report = reconcile()
+        promoted, demoted = sync_celebrities()
+        self.stdout.write(f'Создано профилей: {created}')
+        for model, field, fixed in report:
+            self.stdout.write(
+                f'{model.__name__}.{field}: исправлено строк {fixed}'
+            )
+        self.stdout.write(
+            f'Популярных авторов: новых {promoted}, бывших {demoted}'
+        )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, IndexTask, Post
+from posts.search import COMMENT, POST, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить индекс и построить его с нуля.'
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if options['clear']:
+            # Задачи очереди устаревают: индекс строится по текущим данным.
+            # Без --clear очередь нужна, чтобы убрать удалённые объекты.
+            IndexTask.objects.all().delete()
+            backend.clear()
+        self.reindex(
+            backend, POST, 'Посты',
+            Post.objects.values_list('pk', 'pk', 'text'),
+            options['batch_size']
+        )
+        self.reindex(
+            backend, COMMENT, 'Комментарии',
+            Comment.objects.values_list('pk', 'post_id', 'text'),
+            options['batch_size']
+        )
+
+    def reindex(self, backend, kind, label, rows, batch_size):
+        """Индексирует rows пачками по pk, не держа в памяти всю таблицу."""
+        total = rows.count()
+        done, last_pk = 0, 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk).order_by('pk')[
+                :batch_size
+            ])
+            if not batch:
+                break
+            backend.index([
+                (kind, pk, post_id, text) for pk, post_id, text in batch
+            ])
+            done += len(batch)
+            last_pk = batch[-1][0]
+            self.stdout.write(
+                f'{label}: {done}/{total}'
+                f' ({done * 100 // max(total, 1)}%)'
+            )
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.cache import invalidate_index
+from posts.models import Post
+from posts.thumbnails import prefetch, render_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры картинок постов и заполняет хранилище '
+        'sorl-thumbnail.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры и для постов, у которых они есть.'
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(renditions='')
+        last_pk, found, rendered, failed = 0, 0, 0, 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk).only(
+                'pk', 'image', 'renditions'
+            )[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            if options['all']:
+                for post in batch:
+                    post.renditions = ''
+            # Сначала то, что уже есть в хранилище, затем рендер остального.
+            prefetch(batch)
+            found += sum(1 for post in batch if post.renditions)
+            missing = [post for post in batch if not post.renditions]
+            results = dict(render_many(
+                sorted({post.image.name for post in missing})
+            ))
+            for post in missing:
+                renditions = results.get(post.image.name)
+                if renditions is None:
+                    failed += 1
+                    continue
+                post.renditions = json.dumps(renditions)
+                rendered += 1
+            now = timezone.now()
+            ready = [post for post in batch if post.renditions]
+            for post in ready:
+                post.updated = now
+            Post.objects.bulk_update(ready, ['renditions', 'updated'])
+            self.stdout.write(f'Обработано постов до id={last_pk}')
+        invalidate_index()
+        self.stdout.write(
+            f'Найдено в хранилище: {found}, создано: {rendered}, '
+            f'ошибок: {failed}'
+        )
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# Схема индекса на момент миграции (см. posts.search.SQLiteBackend):
+# rowid документа — pk * 2 + kind, kind 0 — пост, 1 — комментарий.
+TABLE = 'posts_search'
+POST = 0
+COMMENT = 1
+
+
+def insert(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {TABLE} (rowid, body, post_id, kind) '
+        'VALUES (%s, %s, %s, %s)',
+        rows
+    )
+
+
+def build_index(apps, schema_editor):
+    # Индекс FTS5 есть только у SQLite; другие бэкенды строят свой
+    # индекс командой reindex_posts.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Основы слов должны считаться тем же стеммером, что и запросы.
+    from posts.stemmer import stems
+
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    sources = (
+        (POST, Post.objects.values_list('pk', 'pk', 'text')),
+        (COMMENT, Comment.objects.values_list('pk', 'post_id', 'text')),
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING '
+            'fts5(body, post_id UNINDEXED, kind UNINDEXED)'
+        )
+        for kind, rows in sources:
+            batch = []
+            for pk, post_id, text in rows.iterator(chunk_size=BATCH_SIZE):
+                batch.append(
+                    (pk * 2 + kind, ' '.join(stems(text)), post_id, kind)
+                )
+                if len(batch) == BATCH_SIZE:
+                    insert(cursor, batch)
+                    batch = []
+            insert(cursor, batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_scores(apps, schema_editor):
+    from posts.trending import score
+
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('posts', 'Profile')
+    followers = dict(
+        Profile.objects.values_list('user_id', 'followers_count')
+    )
+    batch = []
+    for post in Post.objects.only(
+        'pk', 'pub_date', 'comments_count', 'author_id'
+    ).iterator():
+        post.score = score(
+            post.pub_date,
+            post.comments_count,
+            followers.get(post.author_id, 0)
+        )
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Вес в популярном'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score'], name='post_score'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
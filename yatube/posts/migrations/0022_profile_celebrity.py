@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # Ленты их подписчиков уже собраны без их постов: флаг только
+    # фиксирует то, что раньше вычислялось по числу подписчиков.
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.TIMELINE_CELEBRITY_THRESHOLD
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Популярный автор'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -8,16 +10,34 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField('Постов', default=0)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Всё, что нужно includes/article.html, одним запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_pub_date'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date'
+            ),
+            models.Index(fields=['-score'], name='post_score'),
+        )
 
     text = models.TextField(
         'Текст поста',
@@ -29,6 +49,10 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     author = models.ForeignKey(
         User,
@@ -51,10 +75,36 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    score = models.FloatField('Вес в популярном', default=0, editable=False)
+    renditions = models.TextField(
+        'Миниатюры картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def rendition_list(self):
+        """Готовые миниатюры: size, format, url, width, height."""
+        return json.loads(self.renditions or '[]')
+
+    @property
+    def thumbnails(self):
+        """Миниатюры в запасном формате: размер -> url, width, height.
+
+        Форматы создаются по порядку, запасной — последний.
+        """
+        return {
+            rendition['size']: rendition
+            for rendition in self.rendition_list
+        }
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -76,6 +126,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date'
+            ),
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -100,3 +158,116 @@ class Follow(models.Model):
 
     def __str__(self):
         return self.user
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: запись на каждого подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='uniq_timeline_post'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author'
+            ),
+        )
+
+
+class Profile(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    follows_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты популярного автора не раскладываются по лентам подписчиков,
+    # а читаются при открытии ленты; флаг сверяет sync_celebrities.
+    celebrity = models.BooleanField(
+        'Популярный автор', default=False, editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class IndexTask(models.Model):
+    """Очередь переиндексации: пост или комментарий, который изменился.
+
+    Что делать с объектом, решает обработчик очереди: существующий
+    индексируется заново, удалённый убирается из индекса.
+    """
+    POST = 0
+    COMMENT = 1
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+    kind = models.PositiveSmallIntegerField('Тип', choices=KINDS)
+    object_id = models.PositiveIntegerField('id объекта')
+    created = models.DateTimeField('Дата постановки', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задача индексации'
+        verbose_name_plural = 'Задачи индексации'
+
+
+class Recommendation(models.Model):
+    """Кого почитать: автор, рекомендованный пользователю, и его вес."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField('Вес')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='uniq_recommendation'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-score'],
+                name='recommendation_user_score'
+            ),
+        )
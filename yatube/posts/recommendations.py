@@ -0,0 +1,225 @@
+"""Рекомендации «Кого почитать» по графу подписок.
+
+Граф целиком читается в компактные массивы (CSR: для каждого
+пользователя — отрезок общего массива), после чего оценки считаются
+пачками пользователей без запросов к базе. Вес автора — сумма двух
+сигналов:
+
+* друзья друзей: сколько ваших авторов подписаны на него;
+* совместные подписки: на него подписаны люди, читающие тех же
+  авторов, что и вы, с весом по косинусной близости.
+
+Пользователи внутри графа пронумерованы подряд с нуля, поэтому
+оценки и счётчики копятся в общих массивах array, а не в словарях
+на каждого пользователя.
+"""
+import heapq
+import random
+from array import array
+from math import sqrt
+
+from django.db import transaction
+from django.db.models import Max
+
+from . import follows
+from .models import Follow, Recommendation
+
+LIMIT: int = 10
+SHOWN: int = 5
+FOF_WEIGHT: float = 1.0
+COFOLLOW_WEIGHT: float = 0.5
+# Сколько подписчиков каждого автора учитывается при поиске похожих
+# читателей: ограничивает работу на популярных авторах. Подписчики
+# выбираются случайно, но воспроизводимо (SEED).
+NEIGHBOURS: int = 50
+SEED: int = 0
+# Сколько самых похожих читателей даёт вклад в совместные подписки:
+# у остальных общий автор обычно один, а работа на них — основная.
+SIMILAR: int = 200
+
+
+def _zeros(typecode, size):
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+
+class Graph:
+    """Список смежности в формате CSR по номерам узлов 0..size-1.
+
+    edges — пары номеров, отсортированные по началу.
+    """
+
+    def __init__(self, size, edges):
+        self.starts = _zeros('q', size + 1)
+        self.targets = array('q')
+        for source, target in edges:
+            self.targets.append(target)
+            self.starts[source + 1] = len(self.targets)
+        # У узлов без рёбер отрезок пустой: начало как у предыдущего.
+        for node in range(1, size + 1):
+            if self.starts[node] < self.starts[node - 1]:
+                self.starts[node] = self.starts[node - 1]
+
+    def __getitem__(self, node):
+        return self.targets[self.starts[node]:self.starts[node + 1]]
+
+    def degree(self, node):
+        return self.starts[node + 1] - self.starts[node]
+
+
+def load():
+    """Графы подписок по номерам пользователей.
+
+    Возвращает id пользователей по номерам, прямой (читатель -> авторы)
+    и обратный графы. Все запросы ограничены подписками до max_pk, так
+    что подписки, появившиеся во время чтения, в граф не попадают.
+    """
+    max_pk = Follow.objects.aggregate(last=Max('pk'))['last'] or 0
+    edges = Follow.objects.filter(pk__lte=max_pk).values_list(
+        'user_id', 'author_id'
+    )
+    ids = array('q', sorted(
+        set(edges.values_list('user_id', flat=True).distinct())
+        | set(edges.values_list('author_id', flat=True).distinct())
+    ))
+    index = {pk: number for number, pk in enumerate(ids)}
+
+    def known(ordering):
+        # Транзакция с меньшим pk может закоммититься позже чтения ids
+        # (последовательности PostgreSQL): такие рёбра пропускаются.
+        for user_id, author_id in edges.order_by(*ordering).iterator():
+            if user_id in index and author_id in index:
+                yield index[user_id], index[author_id]
+
+    return (
+        ids,
+        Graph(len(ids), known(('user_id', 'author_id'))),
+        Graph(len(ids), (
+            (author, user) for user, author in
+            known(('author_id', 'user_id'))
+        )),
+    )
+
+
+class Scorer:
+    """Оценки кандидатов в общих массивах, общих для всех пользователей.
+
+    Подписчики каждого автора выбираются один раз на весь пересчёт:
+    не больше NEIGHBOURS случайных, а не с наименьшими id.
+    """
+
+    def __init__(self, followees, followers, size, seed=SEED):
+        self.followees = followees
+        generator = random.Random(seed)
+        self.neighbours = Graph(size, (
+            (author, reader)
+            for author in range(size)
+            for reader in self._sample(followers[author], generator)
+        ))
+        self.norms = array('d', (
+            1 / sqrt(followees.degree(node)) if followees.degree(node)
+            else 0.0
+            for node in range(size)
+        ))
+        self.score = _zeros('d', size)
+        self.common = _zeros('q', size)
+
+    @staticmethod
+    def _sample(readers, generator):
+        if len(readers) <= NEIGHBOURS:
+            return readers
+        return sorted(generator.sample(readers, NEIGHBOURS))
+
+    def _add(self, candidates, weight, touched):
+        score = self.score
+        touched.extend(candidates)
+        for candidate in candidates:
+            score[candidate] += weight
+
+    def _friends(self, own, touched):
+        """Друзья друзей; возвращает читателей с общими авторами."""
+        common, readers = self.common, []
+        for author in own:
+            self._add(self.followees[author], FOF_WEIGHT, touched)
+            for reader in self.neighbours[author]:
+                if not common[reader]:
+                    readers.append(reader)
+                common[reader] += 1
+        return readers
+
+    def _similar(self, user, readers, touched):
+        """Авторы похожих читателей с весом по косинусной близости."""
+        common, norms = self.common, self.norms
+        weights = {}
+        for reader in readers:
+            weights[reader] = common[reader] * norms[reader]
+            common[reader] = 0
+        weights.pop(user, None)
+        own_norm = COFOLLOW_WEIGHT * norms[user]
+        for reader in heapq.nlargest(SIMILAR, weights, key=weights.get):
+            self._add(
+                self.followees[reader], own_norm * weights[reader], touched
+            )
+
+    def top(self, user):
+        """LIMIT лучших авторов для номера user: [(номер, оценка)]."""
+        own = self.followees[user]
+        if not own:
+            return []
+        touched = array('q')
+        self._similar(user, self._friends(own, touched), touched)
+        candidates = set(touched)
+        candidates.difference_update(own)
+        candidates.discard(user)
+        score = self.score
+        best = heapq.nlargest(LIMIT, candidates, key=score.__getitem__)
+        result = [(candidate, score[candidate]) for candidate in best]
+        for candidate in touched:
+            score[candidate] = 0.0
+        return result
+
+
+def rebuild(batch_size=500, progress=None, seed=SEED):
+    """Пересчитывает рекомендации всех пользователей пачками.
+
+    Каждая пачка заменяется в своей транзакции. Возвращает число
+    пользователей, для которых что-то нашлось.
+    """
+    ids, followees, followers = load()
+    scorer = Scorer(followees, followers, len(ids), seed)
+    users = [node for node in range(len(ids)) if followees.degree(node)]
+    found = 0
+    for start in range(0, len(users), batch_size):
+        chunk = users[start:start + batch_size]
+        rows = [
+            Recommendation(
+                user_id=ids[user], author_id=ids[author], score=value
+            )
+            for user in chunk
+            for author, value in scorer.top(user)
+        ]
+        found += len({row.user_id for row in rows})
+        with transaction.atomic():
+            Recommendation.objects.filter(
+                user_id__in=[ids[user] for user in chunk]
+            ).delete()
+            Recommendation.objects.bulk_create(rows)
+        if progress:
+            progress(min(start + batch_size, len(users)), len(users))
+    # Отписавшиеся от всех авторов рекомендаций больше не получают.
+    Recommendation.objects.filter(user__follower__isnull=True).delete()
+    return found
+
+
+def for_user(user, limit=SHOWN):
+    """Рекомендованные авторы без тех, на кого уже подписан user."""
+    rows = list(Recommendation.objects.filter(user=user).select_related(
+        'author'
+    ).order_by('-score')[:LIMIT])
+    if not rows:
+        return []
+    followed = follows.following_many(
+        user.pk, [row.author_id for row in rows]
+    )
+    return [
+        row.author for row in rows if row.author_id not in followed
+    ][:limit]
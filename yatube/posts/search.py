@@ -0,0 +1,208 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс хранит основы слов (см. stemmer), поэтому «посты» находятся
+по запросу «постами». Документ индекса — текст поста или комментария;
+результаты поиска — посты, ранжированные по лучшему совпадению.
+
+Сигналы не трогают индекс напрямую, а ставят IndexTask в очередь;
+process_queue применяет изменения пачками (команда process_search_queue).
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Comment, IndexTask, Post
+from .stemmer import stems
+
+POST: int = IndexTask.POST
+COMMENT: int = IndexTask.COMMENT
+
+BATCH_SIZE: int = 500
+
+# Совпадение в тексте поста весит больше, чем в комментарии.
+WEIGHTS = {POST: 2.0, COMMENT: 1.0}
+
+
+def document_id(kind, pk):
+    """Номер документа индекса: посты и комментарии не пересекаются."""
+    return pk * 2 + kind
+
+
+def normalize(text):
+    return ' '.join(stems(text))
+
+
+class SearchBackend:
+    """Индекс поиска. Реализация выбирается настройкой SEARCH_BACKEND."""
+
+    def install(self):
+        """Создаёт хранилище индекса."""
+        raise NotImplementedError
+
+    def uninstall(self):
+        raise NotImplementedError
+
+    def clear(self):
+        """Удаляет все документы."""
+        raise NotImplementedError
+
+    def index(self, documents):
+        """Добавляет или заменяет документы (kind, pk, post_id, text)."""
+        raise NotImplementedError
+
+    def remove(self, kind, pks):
+        raise NotImplementedError
+
+    def count(self, query):
+        """Число постов, подходящих под запрос."""
+        raise NotImplementedError
+
+    def search(self, query, offset, limit):
+        """id постов, подходящих под запрос, от лучшего к худшему."""
+        raise NotImplementedError
+
+
+class SQLiteBackend(SearchBackend):
+    """Инвертированный индекс на виртуальной таблице SQLite FTS5."""
+
+    table = 'posts_search'
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING '
+                'fts5(body, post_id UNINDEXED, kind UNINDEXED)'
+            )
+
+    def uninstall(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def index(self, documents):
+        rows = [
+            (document_id(kind, pk), normalize(text), post_id, kind)
+            for kind, pk, post_id, text in documents
+        ]
+        with connection.cursor() as cursor:
+            # В FTS5 нет UPSERT: старая версия документа удаляется.
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, body, post_id, kind) '
+                'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, kind, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(document_id(kind, pk),) for pk in pks]
+            )
+
+    @staticmethod
+    def match(query):
+        """Выражение MATCH: все основы запроса, каждая как префикс."""
+        return ' '.join(f'"{word}"*' for word in stems(query))
+
+    def count(self, query):
+        match = self.match(query)
+        if not match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(DISTINCT post_id) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s',
+                [match]
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, query, offset, limit):
+        match = self.match(query)
+        if not match:
+            return []
+        # bm25 тем меньше, чем лучше совпадение. Агрегировать его
+        # напрямую FTS5 не даёт, поэтому оценки считаются в подзапросе;
+        # LIMIT -1 не даёт SQLite встроить подзапрос в GROUP BY.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM (SELECT post_id, bm25({self.table}) '
+                f'* CASE kind WHEN {POST} THEN %s ELSE %s END AS score '
+                f'FROM {self.table} WHERE {self.table} MATCH %s LIMIT -1) '
+                'GROUP BY post_id ORDER BY MIN(score), post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [WEIGHTS[POST], WEIGHTS[COMMENT], match, limit, offset]
+            )
+            return [post_id for post_id, in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def enqueue(kind, pk):
+    IndexTask.objects.create(kind=kind, object_id=pk)
+
+
+def documents(kind, pks):
+    """Документы индекса для существующих объектов из pks."""
+    if kind == POST:
+        rows = Post.objects.filter(pk__in=pks).values_list('pk', 'pk', 'text')
+    else:
+        rows = Comment.objects.filter(pk__in=pks).values_list(
+            'pk', 'post_id', 'text'
+        )
+    return [(kind, pk, post_id, text) for pk, post_id, text in rows]
+
+
+def process_queue(batch_size=BATCH_SIZE):
+    """Применяет к индексу одну пачку задач очереди.
+
+    Повторные задачи на один объект схлопываются. Задачи, поставленные
+    во время обработки, остаются в очереди до следующей пачки.
+    Возвращает число обработанных задач.
+    """
+    tasks = list(IndexTask.objects.order_by('pk').values_list(
+        'pk', 'kind', 'object_id'
+    )[:batch_size])
+    if not tasks:
+        return 0
+    backend = get_backend()
+    for kind in (POST, COMMENT):
+        pks = {object_id for _, task_kind, object_id in tasks
+               if task_kind == kind}
+        if not pks:
+            continue
+        found = documents(kind, pks)
+        backend.index(found)
+        backend.remove(kind, pks - {pk for _, pk, _, _ in found})
+    IndexTask.objects.filter(pk__in=[task[0] for task in tasks]).delete()
+    return len(tasks)
+
+
+class SearchResults:
+    """Результаты поиска для Paginator: посты подгружаются по странице."""
+
+    def __init__(self, query):
+        self.query = query
+
+    def count(self):
+        return get_backend().count(self.query)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = get_backend().search(
+            self.query, index.start, index.stop - index.start
+        )
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
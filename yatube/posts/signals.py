@@ -0,0 +1,83 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, follows, search, thumbnails, timeline, trending
+from .cache import invalidate_index
+from .models import Comment, Follow, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    stored = None
+    if instance.pk is not None:
+        stored = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first()
+    instance._stored_group_id, stored_image = stored or (None, '')
+    instance._image_changed = (instance.image.name or '') != stored_image
+    if instance._image_changed:
+        instance.renditions = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        counters.change_profile(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        trending.refresh(instance.pk)
+    elif instance._stored_group_id != instance.group_id:
+        counters.change_group(instance._stored_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    if instance._image_changed and instance.image:
+        thumbnails.schedule(instance)
+    search.enqueue(search.POST, instance.pk)
+    invalidate_index()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+    search.enqueue(search.POST, instance.pk)
+    invalidate_index()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+        trending.refresh(instance.post_id)
+    search.enqueue(search.COMMENT, instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    trending.refresh(instance.post_id)
+    search.enqueue(search.COMMENT, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_profile(instance.author_id, 'followers_count', 1)
+        counters.change_profile(instance.user_id, 'follows_count', 1)
+        timeline.sync_celebrities([instance.author_id])
+        timeline.backfill(instance.user_id, instance.author_id)
+        follows.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'followers_count', -1)
+    counters.change_profile(instance.user_id, 'follows_count', -1)
+    timeline.drop(instance.user_id, instance.author_id)
+    timeline.sync_celebrities([instance.author_id])
+    follows.invalidate(instance.user_id)
@@ -0,0 +1,133 @@
+"""Стеммер для русского языка (алгоритм Snowball Russian)."""
+import re
+
+VOWELS: str = 'аеиоуыэюя'
+
+# Окончания первой группы удаляются, только если перед ними «а» или «я».
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+     'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+     'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'),
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD = re.compile(r'\w+')
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip(rv, groups):
+    """Удаляет самое длинное подходящее окончание; None, если его нет."""
+    after_vowel, plain = groups
+    suffixes = [(suffix, True) for suffix in after_vowel]
+    suffixes += [(suffix, False) for suffix in plain]
+    suffixes.sort(key=lambda item: len(item[0]), reverse=True)
+    for suffix, needs_vowel in suffixes:
+        if not rv.endswith(suffix):
+            continue
+        rest = rv[:-len(suffix)]
+        if needs_vowel and not rest.endswith(('а', 'я')):
+            continue
+        return rest
+    return None
+
+
+def _perfective(rv):
+    return _strip(rv, PERFECTIVE_GERUND)
+
+
+def _reflexive(rv):
+    stripped = _strip(rv, REFLEXIVE)
+    return rv if stripped is None else stripped
+
+
+def _adjectival(rv):
+    """Окончание прилагательного вместе с суффиксом причастия."""
+    stripped = _strip(rv, ADJECTIVE)
+    if stripped is None:
+        return None
+    participle = _strip(stripped, PARTICIPLE)
+    return stripped if participle is None else participle
+
+
+def _verb_or_noun(rv):
+    stripped = _strip(rv, VERB)
+    return _strip(rv, NOUN) if stripped is None else stripped
+
+
+def _derivational(rv, offset, r2):
+    """Словообразовательный суффикс, если он целиком в области R2."""
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and offset + len(rv) - len(suffix) >= r2:
+            return rv[:-len(suffix)]
+    return rv
+
+
+def _superlative(rv):
+    """Превосходная степень, затем «нн» -> «н» или мягкий знак."""
+    for suffix in SUPERLATIVE:
+        if rv.endswith(suffix):
+            rv = rv[:-len(suffix)]
+            break
+    if rv.endswith(('нн', 'ь')):
+        rv = rv[:-1]
+    return rv
+
+
+def stem(word):
+    """Основа слова: «постами», «посты» и «пост» дают «пост»."""
+    word = word.lower().replace('ё', 'е')
+    start = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2 = _region(word, _region(word))
+    prefix, rv = word[:start], word[start:]
+
+    stripped = _perfective(rv)
+    if stripped is None:
+        rv = _reflexive(rv)
+        stripped = _adjectival(rv)
+        if stripped is None:
+            stripped = _verb_or_noun(rv)
+    if stripped is not None:
+        rv = stripped
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    rv = _derivational(rv, start, r2)
+    return prefix + _superlative(rv)
+
+
+def stems(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD.findall(text)]
@@ -0,0 +1,7 @@
+from django import template
+
+from ..util import page_window
+
+register = template.Library()
+
+register.filter('page_window', page_window)
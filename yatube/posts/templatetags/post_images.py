@@ -0,0 +1,46 @@
+from django import template
+
+register = template.Library()
+
+SIZES: str = '(min-width: 992px) 960px, 100vw'
+
+
+def _srcset(renditions):
+    return ', '.join(
+        f"{rendition['url']} {rendition['width']}w"
+        for rendition in sorted(renditions, key=lambda r: r['width'])
+    )
+
+
+@register.inclusion_tag('posts/includes/image.html')
+def post_image(post, size='960x339'):
+    """Картинка поста с миниатюрами разной ширины и формата.
+
+    Пока миниатюры не готовы, выводится заглушка с пропорциями size.
+    """
+    width, height = size.split('x')
+    context = {'post': post, 'width': width, 'height': height}
+    if not post.image:
+        return context
+    by_format = {}
+    for rendition in post.rendition_list:
+        by_format.setdefault(rendition.get('format', 'JPEG'), []).append(
+            rendition
+        )
+    if not by_format:
+        return context
+    *modern, fallback = by_format
+    thumbnail = post.thumbnails.get(size) or max(
+        by_format[fallback], key=lambda rendition: rendition['width']
+    )
+    context.update({
+        'thumbnail': thumbnail,
+        'srcset': _srcset(by_format[fallback]),
+        'sources': [
+            {'type': f'image/{format.lower()}',
+             'srcset': _srcset(by_format[format])}
+            for format in modern
+        ],
+        'sizes': SIZES,
+    })
+    return context
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from ..models import (
+    Comment, Follow, Group, Post, Profile, Timeline, User
+)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_dataset', users=30, posts=300, groups=3, comments=300,
+            follows=5, batch_size=100, stdout=StringIO()
+        )
+
+    def test_dataset(self):
+        """Данные созданы, счётчики и ленты подписок согласованы."""
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Follow.objects.exists())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            set(Timeline.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ).values_list('post_id', flat=True)),
+            set(Post.objects.filter(
+                author_id=follow.author_id
+            ).values_list('pk', flat=True))
+        )
+        self.assertEqual(
+            sum(Profile.objects.values_list('posts_count', flat=True)), 300
+        )
+        # Даты публикации разбросаны, а не равны моменту вставки.
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 290
+        )
+        # Перекос: у самого популярного автора больше подписчиков,
+        # чем в среднем.
+        top = Follow.objects.values('author').annotate(
+            total=Count('pk')
+        ).order_by('-total')[0]['total']
+        self.assertGreater(top, Follow.objects.count() / 30)
+
+    def test_other_timelines_kept(self):
+        """Генерация не пересобирает ленты существующих пользователей."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(author=author, text='Пост')
+        entries = list(Timeline.objects.filter(user=reader).values_list(
+            'pk', 'post_id'
+        ))
+        call_command(
+            'generate_dataset', users=5, posts=10, groups=1, comments=0,
+            follows=2, prefix='extra', stdout=StringIO()
+        )
+        self.assertEqual(
+            list(Timeline.objects.filter(user=reader).values_list(
+                'pk', 'post_id'
+            )),
+            entries
+        )
+
+    def test_report(self):
+        """Отчёт содержит все ленты на первой и глубоких страницах."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_feeds', output=path, repeat=2, depth=2,
+                stdout=StringIO()
+            )
+            out = StringIO()
+            call_command(
+                'benchmark_feeds', baseline=path, repeat=1, depth=2,
+                stdout=out
+            )
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+        self.assertEqual(report['dataset']['posts'], 300)
+        measured = {
+            (result['view'], result['depth']): result
+            for result in report['results']
+        }
+        for view in ('index', 'group_posts', 'profile', 'follow_index'):
+            for depth in ('shallow', 'deep_page', 'deep_cursor'):
+                with self.subTest(view=view, depth=depth):
+                    result = measured[view, depth]
+                    self.assertEqual(result['status'], 200)
+                    self.assertGreater(result['peak_kb'], 0)
+        self.assertGreater(measured['follow_index', 'shallow']['queries'], 0)
+        self.assertIn(('post_detail', 'shallow'), measured)
+        self.assertIn('index shallow: p50', out.getvalue())
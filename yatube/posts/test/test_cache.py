@@ -0,0 +1,107 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+
+from ..cache import _acquire, _release, index_page_key, single_flight
+from ..models import Post
+from ..util import LIMIT, encode_cursor
+
+User = get_user_model()
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_computed_once_while_fresh(self):
+        """Свежее значение не пересчитывается."""
+        self.assertEqual(single_flight('key', self.compute, 60), 1)
+        self.assertEqual(single_flight('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_recomputed(self):
+        """Смена версии делает значение устаревшим."""
+        single_flight('key', self.compute, 60, version=1)
+        self.assertEqual(single_flight('key', self.compute, 60, version=2), 2)
+
+    def test_stale_value_served_while_locked(self):
+        """Пока значение пересчитывает другой процесс, отдаётся старое."""
+        single_flight('key', self.compute, 60, version=1)
+        cache.add('key:lock', 1)
+        self.assertEqual(single_flight('key', self.compute, 60, version=2), 1)
+        self.assertEqual(self.calls, 1)
+
+    @mock.patch('posts.cache.WAIT_STEPS', 1)
+    def test_foreign_lock_kept_after_timeout(self):
+        """Не дождавшись результата, процесс не снимает чужую блокировку."""
+        cache.add('key:lock', 'other')
+        self.assertEqual(single_flight('key', self.compute, 60), 1)
+        self.assertEqual(cache.get('key:lock'), 'other')
+
+
+class FileLockTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_lock_taken_once(self):
+        """Файловую блокировку берёт только один процесс."""
+        self.assertTrue(_acquire('key:lock', 'first'))
+        self.assertFalse(_acquire('key:lock', 'second'))
+        _release('key:lock', 'second')
+        self.assertFalse(_acquire('key:lock', 'second'))
+        _release('key:lock', 'first')
+        self.assertTrue(_acquire('key:lock', 'second'))
+
+    @mock.patch('posts.cache.LOCK_TIMEOUT', -1)
+    def test_expired_lock_broken(self):
+        """Блокировку упавшего процесса снимают по истечении времени."""
+        self.assertTrue(_acquire('key:lock', 'first'))
+        self.assertTrue(_acquire('key:lock', 'second'))
+
+
+class IndexPageKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def key(self, **params):
+        return index_page_key(self.factory.get('/', params), LIMIT + 1)
+
+    def test_invalid_page_shares_key(self):
+        """Неверные номера страниц дают ключ той страницы, что отдаётся."""
+        self.assertEqual(self.key(page='junk'), self.key())
+        self.assertEqual(self.key(page='0'), self.key(page='2'))
+        self.assertEqual(self.key(page='999'), self.key(page='2'))
+        self.assertNotEqual(self.key(page='1'), self.key(page='2'))
+
+    def test_cursor_key_safe_for_memcached(self):
+        """Ключ курсора годится для memcached, битые курсоры его не плодят."""
+        cursor = encode_cursor(self.post)
+        self.assertEqual(self.key(cursor=cursor), self.key(cursor=cursor))
+        self.assertEqual(
+            self.key(cursor='bad cursor'), self.key(cursor='x' * 300)
+        )
+        for key in (self.key(cursor=cursor), self.key(cursor='x' * 300)):
+            self.assertLess(len(key), 250)
+            self.assertNotIn(' ', key)
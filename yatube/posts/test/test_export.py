@@ -0,0 +1,86 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.old = Post.objects.create(author=cls.author, text='Старый')
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        cls.new = Post.objects.create(
+            author=cls.author, text='Новый', group=cls.group
+        )
+        Comment.objects.create(post=cls.new, author=cls.reader, text='Ура')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, table, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.gz')
+            call_command(
+                'export_content', table, output=path, stdout=StringIO(),
+                **options
+            )
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                return file.read()
+
+    def test_jsonl_since(self):
+        """--since выгружает только записи не старше даты."""
+        rows = [
+            json.loads(line) for line in self.export('posts').splitlines()
+        ]
+        self.assertEqual([row['text'] for row in rows], ['Старый', 'Новый'])
+        self.assertEqual(rows[1]['author'], 'author')
+        self.assertEqual(rows[1]['group'], 'group')
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        rows = self.export('posts', since=since).splitlines()
+        self.assertEqual([json.loads(row)['text'] for row in rows], ['Новый'])
+
+    def test_csv(self):
+        """CSV с заголовком для комментариев и подписок."""
+        comments = list(csv.DictReader(
+            io.StringIO(self.export('comments', format='csv'))
+        ))
+        self.assertEqual(comments[0]['text'], 'Ура')
+        self.assertEqual(comments[0]['post'], str(self.new.pk))
+        follows = list(csv.DictReader(
+            io.StringIO(self.export('follows', format='csv'))
+        ))
+        self.assertEqual(
+            [(row['user'], row['author']) for row in follows],
+            [('reader', 'author')]
+        )
+
+    def test_endpoint_staff_only(self):
+        """Выгрузка по HTTP доступна только персоналу."""
+        url = reverse('posts:export', args=('posts',))
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        text = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(text)))), 2)
+        response = self.client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
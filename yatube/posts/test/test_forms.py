@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
 from ..models import Group, Post, User, Comment
 
@@ -80,6 +82,73 @@ class PostCreateFormTests(TestCase):
             reverse('posts:profile', kwargs={'username': self.user})
         )
 
+    @staticmethod
+    def jpeg(size):
+        content = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', size, 'red').save(content, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            'photo.jpg', content.getvalue(), content_type='image/jpeg'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(100, 100),
+                       POST_THUMBNAIL_WORKERS=0)
+    def test_post_image_downsized_without_metadata(self):
+        """Картинка уменьшается и сохраняется без метаданных."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.jpeg((400, 200))}
+        )
+        post = Post.objects.latest('pk')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(len(image.getexif()), 0)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_post_image_too_large_rejected(self):
+        """Слишком большая по заголовку картинка не принимается."""
+        post_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.jpeg((400, 200))}
+        )
+        self.assertEqual(Post.objects.count(), post_count)
+        self.assertTrue(response.context['form'].errors['image'])
+
+    def test_post_image_unsupported_format_rejected(self):
+        """Картинка в формате не из списка не принимается."""
+        content = BytesIO()
+        Image.new('RGB', (10, 10), 'red').save(content, 'BMP')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': SimpleUploadedFile(
+                'photo.bmp', content.getvalue(), content_type='image/bmp'
+            )}
+        )
+        self.assertFalse(Post.objects.filter(text='Фото').exists())
+        self.assertTrue(response.context['form'].errors['image'])
+
+    @override_settings(POST_IMAGE_MAX_DECODED_PIXELS=1000)
+    def test_post_image_without_draft_limited(self):
+        """Для PNG, который декодируется целиком, предел пикселей ниже."""
+        content = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(content, 'PNG')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': SimpleUploadedFile(
+                'photo.png', content.getvalue(), content_type='image/png'
+            )}
+        )
+        self.assertFalse(Post.objects.filter(text='Фото').exists())
+        self.assertTrue(response.context['form'].errors['image'])
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.jpeg((400, 200))}
+        )
+        self.assertTrue(Post.objects.filter(text='Фото').exists())
+
     def test_anonymous_not_create_post(self):
         """Тест анонимный пользователь не может создать пост."""
         post_count = Post.objects.count()
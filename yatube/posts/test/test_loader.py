@@ -0,0 +1,104 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Follow, Group, IndexTask, Post, Profile, Timeline, User
+from ..trending import score
+
+
+class LoadPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def load(self, name, write, **options):
+        path = os.path.join(self.directory.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8', newline='') as file:
+            write(file)
+        out, err = StringIO(), StringIO()
+        call_command('load_posts', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl(self):
+        """Посты загружаются с исходными датами, как будто их создали."""
+        records = [
+            {'text': 'Первый', 'author': 'author', 'group': 'group',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'text': 'Второй', 'author': 'author',
+             'pub_date': '2020-01-03T00:00:00'},
+            {'text': 'Третий', 'author': 'author'},
+        ]
+        out, _ = self.load('posts.jsonl.gz', lambda file: file.writelines(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ), batch_size=2)
+        self.assertIn('Загружено постов: 3, пропущено: 0', out)
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(
+            first.pub_date,
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(first.group, self.group)
+        self.assertAlmostEqual(first.score, score(first.pub_date, 0, 1))
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 1)
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(IndexTask.objects.count(), 3)
+
+    def test_csv_errors_skipped(self):
+        """Строки с неизвестным автором или группой пропускаются."""
+        def write(file):
+            writer = csv.DictWriter(
+                file, ('text', 'author', 'group', 'pub_date')
+            )
+            writer.writeheader()
+            writer.writerow({'text': 'Есть', 'author': 'author'})
+            writer.writerow({'text': 'Нет автора', 'author': 'ghost'})
+            writer.writerow(
+                {'text': 'Нет группы', 'author': 'author', 'group': 'none'}
+            )
+            writer.writerow(
+                {'text': 'Плохая дата', 'author': 'author',
+                 'pub_date': 'вчера'}
+            )
+
+        out, err = self.load('posts.csv', write)
+        self.assertIn('Загружено постов: 1, пропущено: 3', out)
+        self.assertIn("Строка 3: нет пользователя 'ghost'", err)
+        self.assertEqual(Post.objects.get().text, 'Есть')
+
+    def test_images_scheduled(self):
+        """Для загруженных картинок ставится создание миниатюр."""
+        records = [
+            {'text': 'С картинкой', 'author': 'author', 'image': 'a.jpg'},
+            {'text': 'Без картинки', 'author': 'author'},
+        ]
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            self.load('posts.jsonl', lambda file: file.writelines(
+                json.dumps(record, ensure_ascii=False) + '\n'
+                for record in records
+            ))
+        (post,), _ = schedule.call_args
+        self.assertEqual(post.pk, Post.objects.get(image='a.jpg').pk)
+        self.assertEqual(schedule.call_count, 1)
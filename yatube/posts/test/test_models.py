@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User, Comment
+from ..models import Group, Post, User, Comment, Follow, Profile
 
 
 class PostModelTest(TestCase):
@@ -32,3 +35,40 @@ class PostModelTest(TestCase):
         """Проверяем, что у модели Group корректно работает __str__."""
         group = PostModelTest.group
         self.assertEqual(group.title, str(group))
+
+    def test_counters_follow_changes(self):
+        """Счётчики обновляются при создании и удалении объектов."""
+        reader = User.objects.create_user(username='reader')
+        follow = Follow.objects.create(user=reader, author=self.user)
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        comment = Comment.objects.create(post=post, author=reader, text='К')
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.posts_count, 2)
+        self.assertEqual(profile.followers_count, 1)
+        self.assertEqual(Profile.objects.get(user=reader).follows_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        profile.refresh_from_db()
+        self.assertEqual(profile.posts_count, 1)
+        self.assertEqual(profile.followers_count, 0)
+        self.assertEqual(Group.objects.get().posts_count, 0)
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Profile.objects.filter(user=self.user).update(posts_count=42)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 1)
+
+    def test_drifted_counter_not_negative(self):
+        """Удаление поста, созданного bulk_create, не роняет счётчик."""
+        author = User.objects.create_user(username='bulk')
+        Post.objects.bulk_create(
+            [Post(author=author, text='Пачка', group=self.group)]
+        )
+        Post.objects.get(author=author).delete()
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 0)
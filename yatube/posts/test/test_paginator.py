@@ -1,8 +1,11 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.test import TestCase
 from django.urls import reverse
 
+from ..counters import reconcile
 from ..models import Post, User
-from ..util import LIMIT
+from ..util import LIMIT, page_window
 
 
 class PaginatorViewsTest(TestCase):
@@ -17,6 +20,10 @@ class PaginatorViewsTest(TestCase):
             ) for i in range(LIMIT + 1)
         ]
         Post.objects.bulk_create(new_posts)
+        reconcile()
+
+    def setUp(self):
+        cache.clear()
 
     def test_page_contains_records(self):
         """Проверка: количество постов на странице."""
@@ -29,3 +36,44 @@ class PaginatorViewsTest(TestCase):
                     reverse('posts:index'), {'page': page}
                 )
                 self.assertEqual(len(response.context['page_obj']), posts)
+
+    def test_cursor_pages(self):
+        """Проверка: переход по курсорам вперёд и назад."""
+        url = reverse('posts:profile', kwargs={'username': 'Nikita'})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertIsNotNone(first_page.next_cursor)
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), Post.objects.count() - LIMIT)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        back_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: битый курсор отдаёт первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(len(response.context['page_obj']), LIMIT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_page_window(self):
+        """Проверка: выводится окно номеров вокруг текущей страницы."""
+        paginator = Paginator(range(100 * LIMIT), LIMIT)
+        cases = (
+            (1, [1, 2, 3, 4, None, 100]),
+            (5, [1, 2, 3, 4, 5, 6, 7, 8, None, 100]),
+            (50, [1, None, 47, 48, 49, 50, 51, 52, 53, None, 100]),
+            (100, [1, None, 97, 98, 99, 100]),
+        )
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    page_window(paginator.page(number)), expected
+                )
+        self.assertEqual(page_window(Paginator([], LIMIT).page(1)), [1])
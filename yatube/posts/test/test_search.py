@@ -0,0 +1,116 @@
+import html
+import re
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..models import Comment, IndexTask, Post, User
+from ..search import process_queue
+from ..stemmer import stem
+from ..util import LIMIT
+
+
+class StemmerTests(SimpleTestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова дают одну основу."""
+        for forms in (
+            ('пост', 'посты', 'постами', 'постов'),
+            ('книги', 'книгами', 'книг'),
+            ('красивая', 'красивый', 'красивейший'),
+            ('ёжик', 'ежики'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_foreign_words_unchanged(self):
+        """Слова не на кириллице не изменяются."""
+        self.assertEqual(stem('Django'), 'django')
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Пишу про кошку и котов'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собака друг человека'
+        )
+        cls.comment = Comment.objects.create(
+            author=cls.user, post=cls.dogs, text='А у меня кошка'
+        )
+        process_queue()
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_by_word_form(self):
+        """Пост находится по другой форме слова."""
+        self.assertEqual(self.search('собаки'), [self.dogs])
+
+    def test_post_ranked_above_comment(self):
+        """Совпадение в посте выше совпадения в комментарии."""
+        self.assertEqual(self.search('кошка'), [self.cats, self.dogs])
+
+    def test_index_follows_edits(self):
+        """Правка и удаление меняют результаты поиска."""
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Попугай говорит'
+        dogs.save()
+        self.assertEqual(self.search('попугаи'), [])
+        process_queue()
+        self.assertEqual(self.search('попугаи'), [dogs])
+        self.assertEqual(self.search('собака'), [])
+        Comment.objects.filter(pk=self.comment.pk).delete()
+        process_queue()
+        self.assertEqual(self.search('кошка'), [self.cats])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        process_queue()
+        self.assertEqual(self.search('кошка'), [])
+
+    def test_queue_processed_in_batches(self):
+        """Очередь разбирается пачками, повторы схлопываются."""
+        for number in range(3):
+            Post.objects.create(author=self.user, text=f'Хомяк {number}')
+        self.assertEqual(IndexTask.objects.count(), 3)
+        self.assertEqual(process_queue(batch_size=2), 2)
+        self.assertEqual(len(self.search('хомяки')), 2)
+        call_command('process_search_queue', stdout=StringIO())
+        self.assertFalse(IndexTask.objects.exists())
+        self.assertEqual(len(self.search('хомяки')), 3)
+
+    def test_reindex_posts_command(self):
+        """Команда перестраивает индекс с нуля пачками."""
+        Post.objects.create(author=self.user, text='Хомяк')
+        out = StringIO()
+        call_command('reindex_posts', clear=True, batch_size=1, stdout=out)
+        self.assertIn('Посты: 3/3 (100%)', out.getvalue())
+        self.assertFalse(IndexTask.objects.exists())
+        self.assertEqual(len(self.search('хомяк')), 1)
+        self.assertEqual(self.search('кошка'), [self.cats, self.dogs])
+
+    def test_next_link_keeps_query(self):
+        """Ссылка «Следующая» ведёт на вторую страницу того же поиска."""
+        for number in range(LIMIT + 1):
+            Post.objects.create(author=self.user, text=f'Хомяк {number}')
+        process_queue()
+        response = self.client.get(reverse('posts:search'), {'q': 'хомяк'})
+        link = re.search(
+            r'href="([^"]*)">\s*Следующая', response.content.decode()
+        ).group(1)
+        response = self.client.get(
+            reverse('posts:search') + html.unescape(link)
+        )
+        self.assertEqual(response.context['query'], 'хомяк')
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertEqual(response.context['page_obj'].number, 2)
+
+    def test_empty_query(self):
+        """Без запроса страница поиска пуста."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
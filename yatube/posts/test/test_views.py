@@ -1,5 +1,7 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -7,8 +9,16 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, User, Comment, Follow
+from .. import follows, recommendations, thumbnail_worker, thumbnails
+from ..models import (
+    Comment, Follow, Group, Post, Profile, Recommendation, Timeline, User
+)
+from ..recommendations import NEIGHBOURS, Graph, Scorer
+from ..views import COMMENTS_LIMIT
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -124,23 +134,19 @@ class PostPagesTests(TestCase):
 
     def test_index_page_cache(self):
         """Тест для проверки кэша на главной странице."""
+        self.guest_client.get(self.index_url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.index_url)
+        self.assertContains(response, self.post.text)
         new_post = Post.objects.create(
             author=self.user,
             text='Пост для кеша'
         )
-        response = self.authorized_client.get((self.index_url))
+        response = self.authorized_client.get(self.index_url)
+        self.assertContains(response, new_post.text)
         new_post.delete()
-        response_after_delete = self.authorized_client.get(
-            (self.index_url)
-        )
-        self.assertEqual(response_after_delete.content, response.content)
-        cache.clear()
-        response_after_clear_cache = self.authorized_client.get(
-            (self.index_url)
-        )
-        self.assertNotEqual(
-            response_after_clear_cache.content, response.content
-        )
+        response_after_delete = self.guest_client.get(self.index_url)
+        self.assertNotContains(response_after_delete, new_post.text)
 
     def test_group_list_correct_context(self):
         """Тест корректность отобржения контекста для группы."""
@@ -153,6 +159,15 @@ class PostPagesTests(TestCase):
         self.post_check(response_post)
         self.group_check(response_group)
 
+    def test_group_list_contains_only_group_posts(self):
+        """На странице группы только посты этой группы."""
+        response = self.guest_client.get(self.group_list)
+        self.assertNotIn(self.post_author, response.context['page_obj'])
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            Post.objects.filter(group=self.group).count()
+        )
+
     def test_post_detail_correct_context(self):
         """Тест корректности контекста для post_detail."""
         response = self.authorized_client.get(
@@ -177,6 +192,88 @@ class PostPagesTests(TestCase):
         self.post_check(response_post)
         self.assertEqual(response_author.username, self.user.username)
 
+    def test_user_without_profile(self):
+        """Страницы пользователя без профиля открываются со счётчиками."""
+        User.objects.bulk_create([User(username='bulk')])
+        user = User.objects.get(username='bulk')
+        post = Post.objects.create(author=user, text='Пост без профиля')
+        response = self.guest_client.get(
+            reverse('posts:profile', args=(user.username,))
+        )
+        self.assertContains(response, 'Всего постов: 1')
+        Profile.objects.filter(user=user).delete()
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, 'Всего постов автора: 1')
+
+    def test_article_fragment_cached_until_post_saved(self):
+        """Фрагмент поста берётся из кеша, пока пост не сохранён."""
+        self.guest_client.get(self.profile)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сохранения')
+        response = self.guest_client.get(self.profile)
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'Без сохранения')
+        self.authorized_client.post(
+            self.post_edit,
+            {'text': 'Отредактировано', 'group': self.group.id}
+        )
+        response = self.guest_client.get(self.profile)
+        self.assertContains(response, 'Отредактировано')
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_thumbnail_placeholder_until_rendered(self):
+        """До создания миниатюры показывается заглушка."""
+        response = self.guest_client.get(self.post_detail)
+        self.assertContains(response, 'bg-light')
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        thumbnail = post.thumbnails['960x339']
+        self.assertEqual(thumbnail['width'], 960)
+        response = self.guest_client.get(self.post_detail)
+        self.assertContains(response, thumbnail['url'])
+        for rendition in post.rendition_list:
+            self.assertContains(
+                response, f"{rendition['url']} {rendition['width']}w"
+            )
+        self.assertEqual(
+            {rendition['size'] for rendition in post.rendition_list},
+            set(settings.POST_THUMBNAIL_SIZES)
+        )
+
+    def test_article_fragment_replaced_when_thumbnails_found(self):
+        """Заглушка в кеше фрагмента сменяется найденной миниатюрой."""
+        response = self.guest_client.get(self.profile)
+        self.assertContains(response, 'bg-light')
+        renditions = thumbnail_worker.render(self.post.image.name)
+        response = self.guest_client.get(self.profile)
+        self.assertNotContains(response, 'bg-light')
+        self.assertContains(response, renditions[0]['url'])
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_thumbnails_prefetched_in_one_lookup(self):
+        """Миниатюры страницы ищутся в хранилище одним запросом."""
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        rendered = Post.objects.get(pk=self.post.pk).renditions
+        Post.objects.filter(pk=self.post.pk).update(renditions='')
+        cache.clear()
+        posts = list(Post.objects.filter(image=self.post.image.name))
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        self.assertEqual(posts[0].renditions, rendered)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_warm_thumbnails_command(self):
+        """Команда создаёт миниатюры постов, у которых их нет."""
+        call_command('warm_thumbnails', stdout=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(
+            len(post.rendition_list),
+            len(thumbnails.expected(post.image.name))
+        )
+
     def test_post_edit_correct_context(self):
         """Тест корректность отобржения контекста для редактирование поста."""
         response = self.authorized_client.get(
@@ -280,3 +377,340 @@ class PostPagesTests(TestCase):
             )
         )
         self.assertFalse(response_post.exists())
+
+    def test_timeline_follows_subscription(self):
+        """Лента подписок заполняется при подписке и очищается при отписке."""
+        self.unfollower_client.get(self.profile_follow)
+        timeline = Timeline.objects.filter(user=self.user_unfollower)
+        self.assertTrue(timeline.filter(post=self.post_author).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(timeline.filter(post=new_post).exists())
+        response = self.unfollower_client.get(self.follow_index)
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.unfollower_client.get(self.profile_unfollow)
+        self.assertFalse(timeline.exists())
+
+    def test_follow_backfills_full_history(self):
+        """При подписке в ленту попадают все посты автора, а не последние."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(150)
+        )
+        self.unfollower_client.get(self.profile_follow)
+        self.assertEqual(
+            Timeline.objects.filter(user=self.user_unfollower).count(),
+            Post.objects.filter(author=self.author).count()
+        )
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_celebrity_posts_pulled_into_timeline(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.user_unfollower, author=self.author)
+        Follow.objects.create(user=self.user_follower, author=self.user)
+        celebrity_post = Post.objects.create(
+            author=self.author, text='Пост популярного автора'
+        )
+        self.assertFalse(
+            Timeline.objects.filter(post=celebrity_post).exists()
+        )
+        regular_post = Post.objects.create(author=self.user, text='Пост')
+        response = self.follower_client.get(self.follow_index)
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj)[:2], [regular_post, celebrity_post])
+        self.assertIn(self.post_author, page_obj)
+        self.assertEqual(len(page_obj), Post.objects.filter(
+            author__in=(self.author, self.user)
+        ).count())
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_celebrity_crossing_threshold(self):
+        """Опустившись ниже порога, автор возвращается в ленты подписчиков."""
+        follow = Follow.objects.create(
+            user=self.user_unfollower, author=self.author
+        )
+        self.assertTrue(Profile.objects.get(user=self.author).celebrity)
+        celebrity_post = Post.objects.create(
+            author=self.author, text='Пост популярного автора'
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        follow.delete()
+        self.assertTrue(Profile.objects.get(user=self.author).celebrity)
+        Follow.objects.filter(pk=self.follow.pk).delete()
+        self.assertFalse(Profile.objects.get(user=self.author).celebrity)
+        self.assertEqual(
+            set(Timeline.objects.filter(user=self.user).values_list(
+                'post_id', flat=True
+            )),
+            {self.post_author.pk, celebrity_post.pk}
+        )
+        response = self.authorized_client.get(self.follow_index)
+        self.assertIn(celebrity_post, response.context['page_obj'])
+        Follow.objects.create(user=self.user_unfollower, author=self.author)
+        self.assertTrue(Profile.objects.get(user=self.author).celebrity)
+
+
+class FollowBulkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author-{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            for i in range(2):
+                Post.objects.create(author=author, text=f'{author} {i}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_followee_cache(self):
+        """Проверки подписки читают кеш, подписка его сбрасывает."""
+        ids = [author.pk for author in self.authors]
+        self.assertTrue(follows.is_following(self.reader.pk, ids[0]))
+        with self.assertNumQueries(0):
+            self.assertFalse(follows.is_following(self.reader.pk, ids[1]))
+            self.assertEqual(
+                follows.following_many(self.reader.pk, ids), {ids[0]}
+            )
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        self.assertEqual(
+            follows.following_many(self.reader.pk, ids), set(ids[:2])
+        )
+        follows.follow_many(self.reader, ids)
+        self.assertEqual(follows.following_many(self.reader.pk, ids), set(ids))
+
+    def test_follow_bulk(self):
+        """Подписка пачкой идемпотентна и обновляет счётчики и ленту."""
+        data = {'username': [
+            'author-0', 'author-1', 'author-2', 'reader', 'nobody'
+        ]}
+        response = self.client.post(reverse('posts:follow_bulk'), data)
+        self.assertEqual(response.json(), {
+            'followed': ['author-1', 'author-2'],
+            'unknown': ['nobody'],
+        })
+        response = self.client.post(reverse('posts:follow_bulk'), data)
+        self.assertEqual(response.json()['followed'], [])
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).follows_count, 3
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.authors[1]).followers_count, 1
+        )
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(),
+            Post.objects.filter(author__in=self.authors).count()
+        )
+
+    def test_unfollow_bulk(self):
+        """Отписка пачкой удаляет подписки и записи ленты."""
+        response = self.client.post(
+            reverse('posts:unfollow_bulk'),
+            {'username': ['author-0', 'author-1']}
+        )
+        self.assertEqual(response.json(), {'unfollowed': 1})
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).follows_count, 0
+        )
+
+    def test_unfollow_queries_do_not_grow(self):
+        """Отписка пачкой не делает запросов на каждую подписку."""
+        ids = [author.pk for author in self.authors]
+        follows.follow_many(self.reader, ids)
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(follows.unfollow_many(self.reader, ids[:1]), 1)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(follows.unfollow_many(self.reader, ids[1:]), 2)
+        self.assertEqual(len(one), len(many))
+        self.assertFalse(Profile.objects.filter(
+            user__in=self.authors, followers_count__gt=0
+        ).exists())
+
+    @mock.patch('posts.follows._can_return', return_value=False)
+    def test_bulk_without_returning(self, can_return):
+        """Без RETURNING новые и удалённые подписки читаются заранее."""
+        ids = [author.pk for author in self.authors]
+        self.assertEqual(
+            follows.follow_many(self.reader, ids + ids), ids[1:]
+        )
+        self.assertEqual(follows.follow_many(self.reader, ids), [])
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).follows_count, 3
+        )
+        self.assertEqual(follows.unfollow_many(self.reader, ids[:2]), 2)
+        self.assertEqual(follows.unfollow_many(self.reader, ids[:2]), 0)
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.reader).values_list(
+                'author_id', flat=True
+            )),
+            ids[2:]
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.authors[0]).followers_count, 0
+        )
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend, cls.popular, cls.other = (
+            User.objects.create_user(username=name)
+            for name in ('friend', 'popular', 'other')
+        )
+        cls.twin = User.objects.create_user(username='twin')
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.popular)
+        Follow.objects.create(user=cls.twin, author=cls.friend)
+        Follow.objects.create(user=cls.twin, author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_recommendations_rebuilt_and_shown(self):
+        """Команда считает рекомендации, лента подписок их выводит."""
+        call_command('recommend_follows', stdout=StringIO())
+        scores = dict(Recommendation.objects.filter(
+            user=self.reader
+        ).values_list('author__username', 'score'))
+        self.assertEqual(set(scores), {'popular', 'other'})
+        self.assertGreater(scores['popular'], scores['other'])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['recommendations'], [self.popular, self.other]
+        )
+        Follow.objects.create(user=self.reader, author=self.popular)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['recommendations'], [self.other])
+
+    def test_follow_during_load_skipped(self):
+        """Подписка, созданная во время чтения графа, его не ломает."""
+        graph = recommendations.Graph
+
+        def follow_then_build(size, edges):
+            if not User.objects.filter(username='late').exists():
+                late = User.objects.create_user(username='late')
+                Follow.objects.create(user=late, author=self.friend)
+            return graph(size, edges)
+
+        with mock.patch.object(recommendations, 'Graph', follow_then_build):
+            ids, followees, _ = recommendations.load()
+        late = User.objects.get(username='late')
+        self.assertNotIn(late.pk, ids)
+        self.assertEqual(len(followees.targets), Follow.objects.count() - 1)
+
+    def test_neighbours_sampled(self):
+        """Похожие читатели выбираются случайно, но воспроизводимо."""
+        size = NEIGHBOURS * 3
+        followers = Graph(size, ((0, reader) for reader in range(1, size)))
+        followees = Graph(size, ((reader, 0) for reader in range(1, size)))
+        sample = list(Scorer(followees, followers, size).neighbours[0])
+        self.assertEqual(len(sample), NEIGHBOURS)
+        self.assertNotEqual(sample, list(range(1, NEIGHBOURS + 1)))
+        self.assertEqual(
+            sample, list(Scorer(followees, followers, size).neighbours[0])
+        )
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.discussed = Post.objects.create(author=cls.author, text='Спор')
+        cls.newest = Post.objects.create(author=cls.author, text='Новый')
+
+    def test_trending_ordered_by_score(self):
+        """Комментарии поднимают пост в популярном, лента — одно чтение."""
+        for i in range(3):
+            Comment.objects.create(
+                author=self.author, post=self.discussed, text=f'{i}'
+            )
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.discussed, self.newest, self.quiet]
+        )
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(15):
+            author = User.objects.create_user(username=f'author-{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(author=author, group=cls.group, text=f'{i}')
+        cls.feeds = (
+            (reverse('posts:index'), 2),
+            (reverse('posts:group_list', kwargs={'slug': 'group'}), 2),
+            (reverse('posts:profile', kwargs={'username': 'author-0'}), 3),
+            (reverse('posts:follow_index'), 4),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_feed_query_count(self):
+        """Количество запросов ленты не зависит от числа постов."""
+        for url, queries in self.feeds:
+            with self.subTest(url=url):
+                # сессия и пользователь
+                with self.assertNumQueries(queries + 2):
+                    self.client.get(url)
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for i in range(COMMENTS_LIMIT + 5):
+            Comment.objects.create(
+                author=cls.user, post=cls.post, text=f'Комментарий {i}'
+            )
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def test_comments_paginated_by_cursor(self):
+        """Комментарии выводятся страницей, остальные — по курсору."""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_LIMIT)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': comments.next_cursor}
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][-1]['text'], 'Комментарий 24')
+        self.assertEqual(data['comments'][0]['author'], 'commenter')
+        self.assertIsNone(data['next'])
+
+    def test_new_comment_on_landing_page(self):
+        """После комментария открывается страница, где он виден."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Новый комментарий'},
+            follow=True
+        )
+        comments = response.context['comments']
+        self.assertIn(
+            'Новый комментарий', [comment.text for comment in comments]
+        )
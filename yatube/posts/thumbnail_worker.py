@@ -0,0 +1,61 @@
+"""Код процессов пула миниатюр.
+
+Модуль импортируется дочерним процессом до настройки Django,
+поэтому не должен импортировать модели на уровне модуля.
+"""
+
+
+def init():
+    import django
+    django.setup()
+
+
+def formats():
+    """Форматы POST_THUMBNAIL_FORMATS, которые умеет сохранять Pillow."""
+    from django.conf import settings
+    from PIL import Image
+
+    Image.init()
+    return [
+        format for format in settings.POST_THUMBNAIL_FORMATS
+        if format in Image.SAVE
+    ]
+
+
+def render(image_name):
+    """Создаёт миниатюры POST_THUMBNAIL_SIZES во всех доступных форматах.
+
+    Время попадает в метрики процесса, который выполнял работу; файл
+    метрик сбрасывается сразу, потому что процесс пула может долго
+    простаивать.
+    """
+    from core import prometheus
+
+    try:
+        with prometheus.timer('yatube_thumbnail_render_seconds'):
+            return _render(image_name)
+    finally:
+        prometheus.flush()
+
+
+def _render(image_name):
+    from django.conf import settings
+    from sorl.thumbnail import get_thumbnail
+
+    renditions = []
+    for format in formats():
+        for size in settings.POST_THUMBNAIL_SIZES:
+            thumbnail = get_thumbnail(
+                image_name, size, format=format,
+                **settings.POST_THUMBNAIL_OPTIONS
+            )
+            if not thumbnail.exists():
+                raise FileNotFoundError(image_name)
+            renditions.append({
+                'size': size,
+                'format': format,
+                'url': thumbnail.url,
+                'width': thumbnail.width,
+                'height': thumbnail.height,
+            })
+    return renditions
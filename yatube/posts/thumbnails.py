@@ -0,0 +1,177 @@
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from .cache import invalidate_index
+from .models import Post
+from .thumbnail_worker import formats, init, render
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+def store(post_id, image_name, renditions):
+    # Миниатюры сохраняются, только если картинку не успели заменить.
+    # Смена updated меняет ключ кеша фрагмента поста.
+    Post.objects.filter(pk=post_id, image=image_name).update(
+        renditions=json.dumps(renditions),
+        updated=timezone.now()
+    )
+    invalidate_index()
+
+
+def _filename(source, size, options):
+    """Имя файла миниатюры по схеме sorl-thumbnail 12.
+
+    Ключ — хеш имени исходника, размера и опций; совпадение с именами,
+    которые создаёт get_thumbnail, проверяет тест prefetch.
+    """
+    key = tokey(source.key, size, serialize(options))
+    return (
+        f'{sorl_settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/{key}.'
+        f'{EXTENSIONS[options["format"]]}'
+    )
+
+
+def expected(image_name):
+    """Миниатюры, которые render создаёт для картинки: (size, format, file).
+
+    Имена вычисляются так же, как в get_thumbnail, но без обращения
+    к хранилищу и без создания файлов.
+    """
+    backend = default.backend
+    source = ImageFile(image_name)
+    items = []
+    for format in formats():
+        for size in settings.POST_THUMBNAIL_SIZES:
+            options = {**settings.POST_THUMBNAIL_OPTIONS, 'format': format}
+            for key, value in backend.default_options.items():
+                options.setdefault(key, value)
+            for key, attr in backend.extra_options:
+                value = getattr(sorl_settings, attr)
+                if value != getattr(sorl_defaults, attr):
+                    options.setdefault(key, value)
+            name = _filename(source, size, options)
+            items.append((size, format, ImageFile(name, default.storage)))
+    return items
+
+
+def prefetch(posts):
+    """Находит миниатюры постов страницы, у которых нет renditions.
+
+    Все миниатюры ищутся в хранилище sorl-thumbnail одним пакетным
+    чтением, а не по одному запросу на пост при рендеринге.
+    """
+    pending = {
+        post.pk: expected(post.image.name)
+        for post in posts if post.image and not post.renditions
+    }
+    if not pending:
+        return posts
+    found = default.kvstore.get_many(
+        thumbnail for items in pending.values() for *_, thumbnail in items
+    )
+    for post in posts:
+        items = pending.get(post.pk)
+        if not items or any(item[2].key not in found for item in items):
+            continue
+        post.renditions = json.dumps([
+            {
+                'size': size,
+                'format': format,
+                'url': found[thumbnail.key].url,
+                'width': found[thumbnail.key].width,
+                'height': found[thumbnail.key].height,
+            }
+            for size, format, thumbnail in items
+        ])
+    return posts
+
+
+def _done(post_id, image_name, future):
+    try:
+        renditions = future.result()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+        return
+    # Колбэк выполняется в служебном потоке пула со своим соединением.
+    try:
+        store(post_id, image_name, renditions)
+    finally:
+        connection.close()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init
+        )
+    return _pool
+
+
+def submit(post_id, image_name):
+    global _pool
+    if not settings.POST_THUMBNAIL_WORKERS:
+        try:
+            renditions = render(image_name)
+        except Exception:
+            logger.exception('Не удалось создать миниатюры для %s', image_name)
+            return
+        store(post_id, image_name, renditions)
+        return
+    try:
+        future = _get_pool().submit(render, image_name)
+    except BrokenProcessPool:
+        logger.exception('Пул миниатюр перезапускается')
+        _pool = None
+        future = _get_pool().submit(render, image_name)
+    future.add_done_callback(
+        lambda future: _done(post_id, image_name, future)
+    )
+
+
+def render_many(image_names):
+    """Создаёт миниатюры пачки картинок в пуле: (имя, renditions или None)."""
+    if not settings.POST_THUMBNAIL_WORKERS:
+        futures = None
+    else:
+        futures = [_get_pool().submit(render, name) for name in image_names]
+    for index, image_name in enumerate(image_names):
+        try:
+            if futures is None:
+                yield image_name, render(image_name)
+            else:
+                yield image_name, futures[index].result()
+        except Exception:
+            logger.exception('Не удалось создать миниатюры для %s', image_name)
+            yield image_name, None
+
+
+def schedule(post):
+    """Ставит создание миниатюр в очередь после коммита сохранения поста."""
+    post_id, image = post.pk, post.image
+    try:
+        exists = image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        exists = False
+    if not exists:
+        logger.warning('Картинка %s не найдена в хранилище', image.name)
+        return
+    transaction.on_commit(lambda: submit(post_id, image.name))
@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Follow, Post, Profile, Timeline
+from .util import KEYS as POST_KEYS, MergedFeed
+
+BATCH_SIZE: int = 1000
+
+KEYS = ('pub_date', 'post_id')
+
+
+def _insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def celebrity_followees(user):
+    return list(Follow.objects.filter(
+        user=user, author__profile__celebrity=True
+    ).values_list('author_id', flat=True))
+
+
+def sync_celebrities(author_ids=None):
+    """Сверяет флаг celebrity с числом подписчиков.
+
+    Пока автор популярен, его посты и новые подписки на него в Timeline
+    не пишутся. Поэтому, опустившись ниже порога, он снимает флаг
+    и его посты раскладываются по лентам всех подписчиков заново;
+    уже лежащие записи пропускаются. Возвращает (повышено, понижено).
+    """
+    threshold = settings.TIMELINE_CELEBRITY_THRESHOLD
+    profiles = Profile.objects.all()
+    if author_ids is not None:
+        profiles = profiles.filter(user_id__in=author_ids)
+    promoted = profiles.filter(
+        celebrity=False, followers_count__gte=threshold
+    ).update(celebrity=True)
+    demoted = list(profiles.filter(
+        celebrity=True, followers_count__lt=threshold
+    ).values_list('user_id', flat=True))
+    for start in range(0, len(demoted), BATCH_SIZE):
+        chunk = demoted[start:start + BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        with transaction.atomic():
+            Profile.objects.filter(user_id__in=chunk).update(celebrity=False)
+            _fan_out_select(
+                f'SELECT id, author_id, pub_date FROM {Post._meta.db_table}',
+                f'post.author_id IN ({placeholders})',
+                chunk
+            )
+    return promoted, len(demoted)
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        Timeline(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        ) for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    backfill_many(user_id, [author_id])
+
+
+def backfill_many(user_id, author_ids):
+    """Копирует в ленту user_id всю историю постов авторов.
+
+    Посты читаются потоком и вставляются пачками по BATCH_SIZE,
+    так что память не зависит от числа постов автора.
+    """
+    celebrities = set(Profile.objects.filter(
+        user_id__in=author_ids, celebrity=True
+    ).values_list('user_id', flat=True))
+    author_ids = [pk for pk in author_ids if pk not in celebrities]
+    if not author_ids:
+        return
+    posts = Post.objects.filter(author_id__in=author_ids).values_list(
+        'pk', 'author_id', 'pub_date'
+    )
+    _insert(
+        Timeline(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date
+        ) for post_id, author_id, pub_date in posts.iterator()
+    )
+
+
+def _fan_out_select(posts, condition, params):
+    """INSERT ... SELECT записей ленты для постов из подзапроса posts.
+
+    Популярные авторы пропускаются, уже лежащие в ленте записи тоже;
+    строки вставляются в порядке индекса (user, pub_date). Возвращает
+    число записей.
+    """
+    operations = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            operations.insert_statement(ignore_conflicts=True)
+            + f' {Timeline._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN ({posts}) post ON post.author_id = follow.author_id '
+            f'JOIN {Profile._meta.db_table} profile '
+            'ON profile.user_id = follow.author_id '
+            f'WHERE {condition} AND profile.celebrity = %s '
+            'ORDER BY follow.user_id, post.pub_date'
+            + operations.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            [*params, False]
+        )
+        return cursor.rowcount
+
+
+def rebuild(users):
+    """Раскладывает заново ленты пользователей users (QuerySet User).
+
+    Нужно после массовой загрузки: bulk_create не вызывает сигналы,
+    поэтому fan_out для загруженных постов не срабатывал. Ленты
+    остальных пользователей не трогаются.
+    """
+    Timeline.objects.filter(user__in=users).delete()
+    sql, params = users.values('pk').query.sql_with_params()
+    return _fan_out_select(
+        f'SELECT id, author_id, pub_date FROM {Post._meta.db_table}',
+        f'follow.user_id IN ({sql})',
+        params
+    )
+
+
+def fan_out_since(last_pk):
+    """fan_out для всех постов с pk больше last_pk одним запросом."""
+    return _fan_out_select(
+        f'SELECT id, author_id, pub_date FROM {Post._meta.db_table}',
+        'post.id > %s',
+        [last_pk]
+    )
+
+
+def drop(user_id, author_id):
+    drop_many(user_id, [author_id])
+
+
+def drop_many(user_id, author_ids):
+    Timeline.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def timeline_entries(user):
+    """Лента подписок — диапазонное чтение по индексу (user, pub_date)."""
+    return Timeline.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def resolve_posts(entries):
+    return [entry.post for entry in entries]
+
+
+def timeline_feed(user):
+    """Гибридная лента подписок.
+
+    Посты обычных авторов уже разложены по Timeline (push), посты
+    авторов с флагом celebrity читаются напрямую (pull) и сливаются
+    с ними по pub_date.
+    """
+    entries = timeline_entries(user)
+    celebrities = celebrity_followees(user)
+    if not celebrities:
+        return entries
+    return MergedFeed((
+        (entries.exclude(author_id__in=celebrities), KEYS, resolve_posts),
+        (
+            Post.objects.for_feed().filter(author_id__in=celebrities),
+            POST_KEYS,
+            None
+        ),
+    ))
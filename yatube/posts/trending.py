@@ -0,0 +1,69 @@
+"""Популярные посты.
+
+Вес поста растёт логарифмически от числа комментариев и подписчиков
+автора и линейно от даты публикации. Так затухание по времени не
+требует пересчёта: новый пост обгоняет старый, если у старого не в
+DECAY раз больше отклика за каждые DECAY_SECONDS разницы в возрасте.
+Вес хранится в индексированном столбце Post.score и обновляется при
+создании поста и комментариев, поэтому лента — чтение начала индекса.
+"""
+from math import log
+
+from .models import Post, Profile
+
+COMMENT_WEIGHT: float = 5.0
+FOLLOWER_WEIGHT: float = 0.1
+DECAY: float = 10.0
+DECAY_SECONDS: int = 12 * 3600
+# Отсчёт времени для веса: уменьшает значения столбца.
+EPOCH: int = 1640995200
+
+TOP: int = 100
+BATCH_SIZE: int = 1000
+
+
+def score(pub_date, comments, followers):
+    reach = 1 + COMMENT_WEIGHT * comments + FOLLOWER_WEIGHT * followers
+    return (
+        log(reach, DECAY)
+        + (pub_date.timestamp() - EPOCH) / DECAY_SECONDS
+    )
+
+
+def refresh(post_id):
+    """Пересчитывает вес поста по текущим счётчикам."""
+    values = Post.objects.filter(pk=post_id).values_list(
+        'pub_date', 'comments_count', 'author__profile__followers_count'
+    ).first()
+    if values is None:
+        return
+    pub_date, comments, followers = values
+    Post.objects.filter(pk=post_id).update(
+        score=score(pub_date, comments, followers or 0)
+    )
+
+
+def refresh_all(batch_size=BATCH_SIZE):
+    """Пересчитывает вес всех постов, например после массовой загрузки."""
+    followers = dict(
+        Profile.objects.values_list('user_id', 'followers_count')
+    )
+    batch = []
+    for post in Post.objects.only(
+        'pk', 'pub_date', 'comments_count', 'author_id'
+    ).iterator():
+        post.score = score(
+            post.pub_date,
+            post.comments_count,
+            followers.get(post.author_id, 0)
+        )
+        batch.append(post)
+        if len(batch) == batch_size:
+            Post.objects.bulk_update(batch, ['score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['score'])
+
+
+def top():
+    """TOP популярных постов: диапазонное чтение индекса post_score."""
+    return Post.objects.for_feed().order_by('-score', '-pk')[:TOP]
@@ -1,10 +1,219 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import heapq
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 LIMIT: int = 10
+# Сколько номеров страниц выводить по обе стороны от текущей.
+PAGE_WINDOW: int = 3
+
+KEYS = ('pub_date', 'pk')
+
+NEXT: str = 'n'
+PREVIOUS: str = 'p'
+
+
+def sort_key(obj):
+    return obj.pub_date, obj.pk
+
+
+def encode_cursor(obj, direction=NEXT):
+    raw = f'{direction}|{obj.pub_date.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def ordered(queryset, keys, descending=True):
+    if descending:
+        return queryset.order_by(*(f'-{field}' for field in keys))
+    return queryset.order_by(*keys)
+
+
+class MergedFeed:
+    """Лента, слитая из нескольких упорядоченных потоков (k-way merge).
+
+    Поток — тройка (queryset, keys, resolve): keys — пара полей
+    (дата, ключ), совпадающих с pub_date и pk поста, resolve превращает
+    объекты потока в посты. Подходит для Paginator и CursorPaginator.
+    """
+
+    def __init__(self, streams):
+        self.streams = [
+            (ordered(queryset, keys), keys, resolve)
+            for queryset, keys, resolve in streams
+        ]
+
+    def count(self):
+        return sum(queryset.count() for queryset, _, _ in self.streams)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        heads = [
+            resolve(queryset[:index.stop]) if resolve
+            else queryset[:index.stop]
+            for queryset, _, resolve in self.streams
+        ]
+        merged = heapq.merge(*heads, key=sort_key, reverse=True)
+        return list(islice(merged, index.start, index.stop))
+
 
+class CursorPage(Page):
+    is_cursor = True
 
-def paginator(queryset, request):
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, pk) без COUNT(*) и OFFSET.
+
+    Стоимость страницы не зависит от её глубины: каждая страница —
+    это диапазонное чтение по индексу от позиции курсора в каждом
+    потоке ленты.
+    """
+
+    def __init__(self, object_list, per_page, descending=True, keys=KEYS,
+                 resolve=None):
+        if isinstance(object_list, MergedFeed):
+            streams = object_list.streams
+        else:
+            object_list = ordered(object_list, keys, descending)
+            streams = [(object_list, keys, resolve)]
+        super().__init__(object_list, per_page)
+        self.descending = descending
+        self.streams = streams
+
+    def _fetch(self, queryset, keys, resolve, decoded, forward):
+        reverse = forward == self.descending
+        if decoded is not None:
+            _, pub_date, pk = decoded
+            date_key, pk_key = keys
+            lookup = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{date_key}__{lookup}': pub_date})
+                | Q(**{date_key: pub_date, f'{pk_key}__{lookup}': pk})
+            )
+        items = ordered(queryset, keys, reverse)[:self.per_page + 1]
+        return resolve(items) if resolve else list(items)
+
+    def cursor_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        forward = decoded is None or decoded[0] == NEXT
+        chunks = [
+            self._fetch(queryset, keys, resolve, decoded, forward)
+            for queryset, keys, resolve in self.streams
+        ]
+        merged = heapq.merge(
+            *chunks, key=sort_key, reverse=forward == self.descending
+        )
+        items = list(islice(merged, self.per_page + 1))
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if not forward:
+            items.reverse()
+        if not items:
+            return CursorPage(items, self, None, None)
+        next_cursor = previous_cursor = None
+        if has_more or not forward:
+            next_cursor = encode_cursor(items[-1], NEXT)
+        if decoded is not None and (has_more or forward):
+            previous_cursor = encode_cursor(items[0], PREVIOUS)
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+def paginator(queryset, request, keyset=False, keys=KEYS, resolve=None,
+              count=None):
+    """Страница ленты.
+
+    С keyset=True представление разрешает переход по курсору ?cursor=...;
+    нумерованные страницы ?page=N при этом продолжают работать, а ссылки
+    «Следующая»/«Предыдущая» ведут на курсоры соседних страниц.
+    keys и resolve описывают ленту, которая строится не по модели Post
+    (см. MergedFeed). count — заранее известное число объектов
+    (денормализованный счётчик), избавляет от COUNT(*).
+    """
+    cursor = request.GET.get('cursor')
+    if keyset and cursor:
+        return CursorPaginator(
+            queryset, LIMIT, keys=keys, resolve=resolve
+        ).cursor_page(cursor)
+    merged = isinstance(queryset, MergedFeed)
+    if keyset and not merged:
+        queryset = ordered(queryset, keys)
     paginator = Paginator(queryset, LIMIT)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if resolve is not None and not merged:
+        page_obj.object_list = resolve(page_obj.object_list)
+    if keyset and page_obj.object_list:
+        page_obj.object_list = list(page_obj.object_list)
+        if page_obj.has_next():
+            page_obj.next_cursor = encode_cursor(page_obj[-1], NEXT)
+        if page_obj.has_previous():
+            page_obj.previous_cursor = encode_cursor(page_obj[0], PREVIOUS)
     return page_obj
+
+
+def page_window(page, on_each_side=PAGE_WINDOW):
+    """Номера страниц вокруг текущей для навигации; None — пропуск.
+
+    Первая и последняя страницы выводятся всегда, так что ссылок
+    не больше 2 * on_each_side + 5 при любом числе страниц.
+    """
+    last = page.paginator.num_pages
+    start = max(page.number - on_each_side, 1)
+    end = min(page.number + on_each_side, last)
+    numbers = list(range(start, end + 1))
+    if start > 1:
+        numbers[:0] = [1] if start == 2 else [1, None]
+    if end < last:
+        numbers += [last] if end == last - 1 else [None, last]
+    return numbers
+
+
+@contextmanager
+def preserved_dates(model, *fields):
+    """Отключает auto_now/auto_now_add полей, чтобы сохранить свои даты."""
+    saved = []
+    for name in fields:
+        field = model._meta.get_field(name)
+        saved.append((field, field.auto_now, field.auto_now_add))
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
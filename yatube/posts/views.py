@@ -1,26 +1,54 @@
+from urllib.parse import urlencode
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    HttpResponseBadRequest, Http404, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.db.models import Q
+from django.views.decorators.http import require_POST
+
+from core import prometheus
 
+from . import counters, export, follows, recommendations, trending
+from .cache import index_page
+from .thumbnails import prefetch
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .util import paginator
+from .models import Post, Group, User
+from .search import SearchResults
+from .timeline import KEYS as TIMELINE_KEYS
+from .timeline import resolve_posts, timeline_feed
+from .util import KEYS, CursorPaginator, encode_cursor, ordered, paginator
 
 FIRST_THIRTY: int = 30
+COMMENTS_LIMIT: int = 20
 
 
-@cache_page(20)
 def index(request):
-    post_list = Post.objects.select_related('group')
-    page_obj = paginator(post_list, request)
+    page_obj = index_page(
+        request,
+        lambda count: prefetch(paginator(
+            Post.objects.for_feed(), request, keyset=True, count=count
+        ))
+    )
     return render(request, 'posts/index.html', {'page_obj': page_obj})
 
 
+def trending_posts(request):
+    page_obj = prefetch(paginator(trending.top(), request))
+    return render(request, 'posts/trending.html', {'page_obj': page_obj})
+
+
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.all()
-    page_obj = paginator(posts, request)
+    posts = Post.objects.for_feed().filter(group=group)
+    page_obj = prefetch(paginator(
+        posts, request, keyset=True, count=group.posts_count
+    ))
     return render(
         request,
         'posts/group_list.html',
@@ -32,12 +60,17 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
-    page_obj = paginator(posts, request)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author).exists()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts = Post.objects.for_feed().filter(author=author)
+    page_obj = prefetch(paginator(
+        posts, request, keyset=True,
+        count=counters.profile(author).posts_count
+    ))
+    following = (
+        request.user.is_authenticated
+        and follows.is_following(request.user.pk, author.pk)
     )
     return render(
         request,
@@ -45,15 +78,68 @@ def profile(request, username):
         {
             'author': author,
             'page_obj': page_obj,
-            'following': following
+            'following': following,
+            'recommendations': (
+                recommendations.for_user(author)
+                if request.user == author else ()
+            ),
         }
     )
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = prefetch(paginator(SearchResults(query), request))
+    return render(
+        request,
+        'posts/search.html',
+        {
+            'query': query,
+            'page_obj': page_obj,
+            'params': urlencode({'q': query}) + '&',
+        }
+    )
+
+
+def comments_page(post, cursor):
+    """Страница комментариев поста от старых к новым по курсору."""
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_LIMIT,
+        descending=False
+    ).cursor_page(cursor)
+
+
+def comment_url(comment):
+    """Адрес страницы поста, на которой виден комментарий.
+
+    Если перед комментарием больше страницы других, страница начинается
+    с курсора предыдущего комментария, иначе это первая страница.
+    """
+    url = reverse('posts:post_detail', kwargs={'post_id': comment.post_id})
+    earlier = list(ordered(
+        comment.post.comments.filter(
+            Q(pub_date__lt=comment.pub_date)
+            | Q(pub_date=comment.pub_date, pk__lt=comment.pk)
+        ),
+        KEYS
+    )[:COMMENTS_LIMIT])
+    if len(earlier) < COMMENTS_LIMIT:
+        return url
+    return f'{url}?{urlencode({"cursor": encode_cursor(earlier[0])})}'
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__profile'),
+        pk=post_id
+    )
+    prefetch([post])
+    counters.profile(post.author)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comments_page(post, request.GET.get('cursor'))
     title = f'Пост {str(post)}'
     return render(
         request,
@@ -67,7 +153,29 @@ def post_detail(request, post_id):
     )
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев поста в JSON для подгрузки."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comments_page(post, request.GET.get('cursor'))
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=(comment.author.username,)
+                ),
+                'text': comment.text,
+                'pub_date': comment.pub_date.isoformat(),
+            }
+            for comment in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -82,6 +190,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     is_edit = True
     post = get_object_or_404(Post, id=post_id)
@@ -110,6 +219,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(
@@ -120,27 +230,87 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        return redirect(comment_url(comment))
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(post_list, request)
-    return render(request, 'posts/follow.html', {'page_obj': page_obj})
+    with prometheus.timer('yatube_follow_feed_seconds'):
+        page_obj = prefetch(paginator(
+            timeline_feed(request.user),
+            request,
+            keyset=True,
+            keys=TIMELINE_KEYS,
+            resolve=resolve_posts
+        ))
+    return render(
+        request,
+        'posts/follow.html',
+        {
+            'page_obj': page_obj,
+            'recommendations': recommendations.for_user(request.user),
+        }
+    )
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        follows.follow_many(request.user, [author.pk])
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(user=request.user, author=author).exists():
-        Follow.objects.filter(user=request.user, author=author).delete()
+    follows.unfollow_many(request.user, [author.pk])
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка на несколько авторов: POST username=...&username=..."""
+    usernames = request.POST.getlist('username')
+    authors = follows.resolve(usernames, request.user)
+    followed = follows.follow_many(request.user, list(authors))
+    return JsonResponse({
+        'followed': sorted(authors[pk] for pk in followed),
+        'unknown': sorted(
+            set(usernames) - set(authors.values()) - {request.user.username}
+        ),
+    })
+
+
+@login_required
+@require_POST
+def unfollow_bulk(request):
+    authors = follows.resolve(request.POST.getlist('username'), request.user)
+    return JsonResponse(
+        {'unfollowed': follows.unfollow_many(request.user, list(authors))}
+    )
+
+
+@staff_member_required
+def export_table(request, table):
+    """Выгрузка таблицы для аналитики: gzip JSONL или CSV потоком."""
+    if table not in export.TABLES:
+        raise Http404
+    format = request.GET.get('format', 'jsonl')
+    if format not in export.FORMATS:
+        return HttpResponseBadRequest('format: jsonl или csv')
+    since = None
+    if request.GET.get('since'):
+        since = export.parse_since(request.GET['since'])
+        if since is None:
+            return HttpResponseBadRequest('since: дата в формате ISO 8601')
+    response = StreamingHttpResponse(
+        export.export(table, format, since),
+        content_type='application/gzip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{format}.gz"'
+    )
+    return response
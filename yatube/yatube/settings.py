@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +58,34 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request metrics (core.middleware.MetricsMiddleware)
+# Per URL name, the last METRICS_WINDOW requests are kept in memory; their
+# percentiles and histogram are served at /metrics/latency (same access as
+# /metrics, answered by whichever process receives the request).
+# Requests slower than SLOW_REQUEST_MS are logged; None disables the log.
+METRICS_WINDOW = 1000
+
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500)) or None
+
+# Prometheus metrics (core.prometheus, served at /metrics)
+# With several worker processes set METRICS_DIR: each process writes its
+# values to METRICS_DIR/<pid>.json at most every METRICS_FLUSH_INTERVAL
+# seconds and /metrics sums all files. Empty the directory on deploy.
+# Without it only the process that answers the scrape is reported.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+
+METRICS_FLUSH_INTERVAL = 1.0
+
+# /metrics is closed unless configured. A scraper either sends
+# "Authorization: Bearer <METRICS_TOKEN>" or connects from an address in
+# METRICS_ALLOWED_IPS. Behind a reverse proxy every request comes from
+# the proxy's address, so use the token there.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+METRICS_ALLOWED_IPS = tuple(filter(None, os.environ.get(
+    'METRICS_ALLOWED_IPS', ''
+).split(',')))
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
@@ -89,13 +118,55 @@ DATABASES = {
 }
 
 # Caches
+# LocMemCache is private to each worker process. Set CACHE_BACKEND to share
+# the cache between workers: 'file' (CACHE_LOCATION is a directory) or
+# 'memcached' (CACHE_LOCATION is host:port, needs python-memcached).
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache') if CACHE_BACKEND == 'file' else ''
+        ),
     }
 }
 
+# Follow timeline
+# Authors with at least this many followers are not fanned out to follower
+# timelines; their posts are pulled and merged in when the feed is read.
+TIMELINE_CELEBRITY_THRESHOLD = 10000
+
+# Post thumbnails
+# Renditions generated in the background when a post image is saved.
+# With POST_THUMBNAIL_WORKERS = 0 they are generated inside the request.
+# Every size is rendered in every format the installed Pillow can encode;
+# the last format is the fallback for browsers without <picture> support.
+POST_THUMBNAIL_SIZES = ('320x113', '640x226', '960x339')
+
+POST_THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True, 'quality': 80}
+
+POST_THUMBNAIL_WORKERS = int(os.environ.get('POST_THUMBNAIL_WORKERS', 2))
+
+# Full-text search
+# Index backend for posts and comments (see posts.search). Changes are
+# queued by signals and applied by `manage.py process_search_queue --loop`.
+SEARCH_BACKEND = 'posts.search.SQLiteBackend'
+
+# sorl-thumbnail key-value store: cached_db with batched lookups for
+# whole feed pages (see posts.kvstore).
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -150,3 +221,24 @@ CSRF_FAILURE_VIEW = 'core.views.permission_denied_view'
 # Media File
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Uploads larger than this are streamed to a temporary file on disk
+# instead of being held in worker memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Post images
+# Uploads are rejected by format (JPEG, PNG, WebP, GIF), file size and
+# the pixel count read from the image header; accepted originals are
+# downsized to POST_IMAGE_MAX_SIZE and re-encoded without metadata
+# (animated GIFs are kept as uploaded).
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+
+# JPEG is decoded already downscaled, so a large original is cheap.
+POST_IMAGE_MAX_PIXELS = 40_000_000
+
+# Other formats are decoded at full size (4 bytes per pixel in RGBA).
+POST_IMAGE_MAX_DECODED_PIXELS = 12_000_000
+
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+
+POST_IMAGE_QUALITY = 85